@@ -1,15 +1,17 @@
 import asyncio
 import logging
 import atexit
-import time
 from urllib import parse
-from datetime import datetime
-from unsync import unsync
 from websockets import InvalidURI, ConnectionClosedError, ConnectionClosedOK
 from charge_point.data import logging_filter
 from charge_point.hardware.components import LCDModule, PN532Reader
+from charge_point.hardware.io_executor import HardwareExecutor, LoopLagMonitor
+from charge_point.hardware.rfid_reader import RFIDReaderService
+from charge_point.runtime import TaskSupervisor, FatalTaskError
 from charge_point.v16.ChargePoint16 import ChargePointV16, enums
 from charge_point.v201.ChargePoint201 import ChargePointV201
+from charge_point.connectors.ChargingConnector import ConnectorSettingsManager
+from charge_point.data.auth.authorization_cache import AuthorizationCache
 from charge_point import responses
 import RPi.GPIO as GPIO
 import websockets
@@ -20,88 +22,92 @@ import os
 
 lcd: LCDModule = None
 charge_point_reference = None
+runtime: TaskSupervisor = None
 logger = logging.getLogger('chargepi_logger')
 path = os.path.dirname(os.path.realpath(__file__))
 GPIO.setmode(GPIO.BCM)
 
 
-@unsync
-async def choose_protocol_version():
-    global lcd, charge_point_reference
-    charge_point_info, hardware_info = await settings_reader.read_settings()
-    charge_point_id: str = charge_point_info["id"]
-    charge_point_uri: str = charge_point_info["server_uri"]
+async def main():
+    global lcd, runtime
+    charge_point_info, hardware_info, storage_info = await settings_reader.read_settings()
     # Setup logger
-    logging_filter.setup_logger(charge_point_info["log_server"], charge_point_id)
-    # Run RFID reader and LCD display in separate threads
+    logging_filter.setup_logger(charge_point_info["log_server"], charge_point_info["id"])
+    ConnectorSettingsManager.set_flush_interval(int(storage_info.get("flush_interval", 5)))
+    ConnectorSettingsManager.set_backend(storage_info.get("backend", "json"), storage_info.get("database_file", ""))
+    AuthorizationCache.set_flush_interval(int(storage_info.get("flush_interval", 5)))
+    # Load the cached tags before the first tag can be read
+    authorization_cache: AuthorizationCache = AuthorizationCache(
+        max_cached_tags=int(storage_info.get("auth_cache_max_size", 1000)))
+    await authorization_cache.load()
     lcd = LCDModule(hardware_info["lcd"])
+    runtime = TaskSupervisor(min_backoff=10, max_backoff=120)
+    # Log when the event loop is blocked
+    runtime.add("loop_lag", LoopLagMonitor().run)
+    start_rfid_reader(hardware_info)
+    if lcd.is_lcd_supported:
+        runtime.add("display", display_status)
+    # If the connection goes out, try reconnecting
+    runtime.add("ocpp", lambda: choose_protocol_version(charge_point_info, hardware_info, authorization_cache))
+    await runtime.wait()
+
+
+async def choose_protocol_version(charge_point_info: dict, hardware_info: dict,
+                                  authorization_cache: AuthorizationCache = None):
+    global charge_point_reference
+    charge_point_id: str = charge_point_info["id"]
+    charge_point_uri: str = charge_point_info["server_uri"]
     protocol_version = charge_point_info["protocol_version"]
     # Check URL validity
     if parse.urlparse(charge_point_uri).path.endswith("/"):
         charge_point_uri = charge_point_uri[:charge_point_uri.rfind("/")]
-    # If the connection goes out, try reconnecting every 10 seconds
-    threads = []
-    while True:
-        try:
-            # Connect to the server using websockets.
-            async with websockets.connect(f"ws://{charge_point_uri}/{charge_point_id}",
-                                          subprotocols=[f"ocpp{protocol_version}"]) as ws:
-                logger.info(f"Choosing protocol version {protocol_version}")
-                if protocol_version == "1.6":
-                    # Create a singleton
-                    ChargePointV16(charge_point_id, ws, charge_point_info, hardware_info)
-                    charge_point_reference = ChargePointV16.getInstance()
-                elif protocol_version == "2.0.1":
-                    # Create a singleton
-                    ChargePointV201(charge_point_id, ws, charge_point_info, hardware_info)
-                    charge_point_reference = ChargePointV201.getInstance()
-                else:
-                    # If the version is not supported, exit
-                    version_unsupported_str: str = f"Unsupported OCPP version: {protocol_version}"
-                    logger.debug(version_unsupported_str)
-                    print(version_unsupported_str)
-                    exit(-1)
-                # Start listening for requests and send boot notification to the server
-                display_current_status_LCD()
-                read_rfid(hardware_info)
-                await asyncio.gather(charge_point_reference.start(), charge_point_reference.send_boot_notification())
-        except ConnectionClosedOK as closed_ok:
-            logger.error("Connection closed, no error", exc_info=closed_ok)
-        except ConnectionClosedError as error:
-            logger.error("Connection closed with error", exc_info=error)
-        except InvalidURI as invalid_uri:
-            logger.error("Invalid URI specified, exiting", exc_info=invalid_uri)
-            exit(-1)
-        except KeyboardInterrupt:
-            exit(-1)
-        except Exception as ex:
-            logger.error("Unknown error", exc_info=ex)
-        for thread in threads:
-            try:
-                thread.future.cancel()
-                thread.thread.set_exception()
-            except Exception:
-                pass
-        await asyncio.sleep(10)
-
-
-@unsync
-def display_current_status_LCD():
-    global lcd
-    if lcd.is_lcd_supported:
-        asyncio.run(display_status())
+    try:
+        # Connect to the server using websockets.
+        async with websockets.connect(f"ws://{charge_point_uri}/{charge_point_id}",
+                                      subprotocols=[f"ocpp{protocol_version}"]) as ws:
+            logger.info(f"Choosing protocol version {protocol_version}")
+            if protocol_version == "1.6":
+                # Create a singleton
+                ChargePointV16(charge_point_id, ws, charge_point_info, hardware_info,
+                               authorization_cache=authorization_cache)
+                charge_point_reference = ChargePointV16.getInstance()
+            elif protocol_version == "2.0.1":
+                # Create a singleton
+                ChargePointV201(charge_point_id, ws, charge_point_info, hardware_info,
+                                authorization_cache=authorization_cache)
+                charge_point_reference = ChargePointV201.getInstance()
+            else:
+                # If the version is not supported, exit
+                version_unsupported_str: str = f"Unsupported OCPP version: {protocol_version}"
+                logger.debug(version_unsupported_str)
+                print(version_unsupported_str)
+                raise FatalTaskError(version_unsupported_str)
+            # Start listening for requests and send boot notification to the server
+            await asyncio.gather(charge_point_reference.start(), charge_point_reference.send_boot_notification())
+    except ConnectionClosedOK as closed_ok:
+        logger.error("Connection closed, no error", exc_info=closed_ok)
+    except ConnectionClosedError as error:
+        logger.error("Connection closed with error", exc_info=error)
+    except InvalidURI as invalid_uri:
+        logger.error("Invalid URI specified, exiting", exc_info=invalid_uri)
+        raise FatalTaskError("Invalid URI specified") from invalid_uri
 
 
 async def display_status():
     global charge_point_reference
     while True:
+        if charge_point_reference is None or len(charge_point_reference.get_connectors) == 0:
+            await asyncio.sleep(1)
+            continue
         try:
             for connector in charge_point_reference.get_connectors:
                 await lcd.display_current_status(connector.connector_id,
                                                  connector.is_charging(),
                                                  connector.get_power_draw)
         except Exception as ex:
+            logger.error("Failed displaying the connector status", exc_info=ex)
             print(ex)
+            await asyncio.sleep(1)
 
 
 def get_reader(reader_info):
@@ -118,54 +124,48 @@ def get_reader(reader_info):
     return None
 
 
-@unsync
-def read_rfid(charge_point_info: dict):
-    global lcd
-    reader_info = charge_point_info["rfid_reader"]
+def start_rfid_reader(hardware_info: dict):
+    """
+    Start reading the tags and handling the tapped tags in the background.
+    :param hardware_info: Hardware settings
+    :return:
+    """
+    reader_info: dict = hardware_info["rfid_reader"]
     reader = get_reader(reader_info)
-    # Start listening for RFID tag
+    if reader is None:
+        # If no RFID reader is present, charging will begin at a request from server
+        return
+    tag_queue: asyncio.Queue = asyncio.Queue()
+    reader_service: RFIDReaderService = RFIDReaderService(reader, reader_info["reader_model"], tag_queue,
+                                                          hold_off=float(reader_info.get("hold_off", 2)),
+                                                          irq_pin=int(reader_info.get("irq_pin", 0)))
+    runtime.add("rfid_reader", reader_service.run)
+    runtime.add("rfid_requests", lambda: handle_requests(tag_queue))
+
+
+async def handle_requests(tag_queue: asyncio.Queue):
+    """
+    Handle the tapped tags one by one.
+    :param tag_queue: Queue of tag UIDs
+    :return:
+    """
     while True:
+        rfid_id: str = await tag_queue.get()
         try:
-            if reader is not None:
-                print(f"{datetime.today()}: Scanning for a tag")
-                uid: str = ""
-                if reader_info["reader_model"] == "MFRC522":
-                    try:
-                        uid = hex(reader.read_id_no_block()).strip("0x").upper()[:-2]
-                    except Exception:
-                        pass
-                    time.sleep(.3)
-                elif reader_info["reader_model"] == "PN532":
-                    try:
-                        uid_byte: bytearray = reader.read_passive()
-                        uid = uid_byte.hex().upper()
-                    except Exception:
-                        pass
-                if is_full_string(uid):
-                    read_tag_info: str = f"Read tag {uid} at {datetime.today()}"
-                    logger.info(read_tag_info)
-                    print(read_tag_info)
-                    handle_request(uid)
-                    # Wait to be sure the card is removed
-                    time.sleep(4)
-            else:
-                # If no RFID reader is present, charging will begin at a request from server
-                # Break the loop to end the thread and avoid performance issues
-                break
-        except Exception as e:
-            logger.error("Exception while reading RFID", exc_info=e)
-            print(str(e))
-            asyncio.run(lcd.display_error(connector_id=-1, msg="Error reading card"))
-            if isinstance(reader, PN532Reader):
-                reader.reset()
-
-
-@unsync
+            await handle_request(rfid_id)
+        except Exception as ex:
+            logger.error("Exception while handling tag request", exc_info=ex)
+        finally:
+            tag_queue.task_done()
+
+
 async def handle_request(rfid_id: str):
     global lcd, charge_point_reference
+    if charge_point_reference is None:
+        return
     await asyncio.gather(charge_point_reference.indicate_card_read(), lcd.display_card_detected())
     try:
-        if charge_point_reference is not None and is_full_string(rfid_id):
+        if is_full_string(rfid_id):
             connector_id, response = await charge_point_reference.handle_charging_request(rfid_id)
             if response == responses.StartChargingSuccess:
                 await lcd.start_charging_message(connector_id=connector_id)
@@ -201,8 +201,12 @@ def client_cleanup():
         print("Problem at cleanup: {ex}".format(ex=str(ex)))
         logger.debug("Exception while cleaning up", exc_info=ex)
     finally:
+        HardwareExecutor.shutdown()
         GPIO.cleanup()
 
 
 if __name__ == '__main__':
-    choose_protocol_version().result()
+    try:
+        asyncio.get_event_loop().run_until_complete(main())
+    except (FatalTaskError, KeyboardInterrupt):
+        exit(-1)
@@ -0,0 +1,66 @@
+"""
+Time to the first authorized tap after a reboot: a cold cache, which is not loaded from auth.json and sends the
+first tap to the central system, vs. a cache warmed by load() at boot, for 1,000 to 100,000 cached tags.
+
+Run from the client directory:
+    python benchmarks/auth_warmup.py
+"""
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from charge_point.data.auth.authorization_cache import AuthorizationCache
+
+SIZES: list = [1000, 10000, 100000]
+
+
+def write_auth_file(file_name: str, tags: int):
+    with open(file_name, "w") as auth_file:
+        json.dump({"version": 1,
+                   "local_list": [],
+                   "authorized_tags": [{"id": f"{i:08X}", "status": "Accepted",
+                                        "expiry_date": "2999-01-01T00:00:00.000Z"} for i in range(tags)]},
+                  auth_file)
+
+
+async def first_tap(cache: AuthorizationCache, id_tag: str) -> (bool, float):
+    started: float = time.perf_counter()
+    is_authorized: bool = await cache.is_tag_authorized(id_tag)
+    return is_authorized, time.perf_counter() - started
+
+
+async def main():
+    directory: str = tempfile.mkdtemp()
+    try:
+        for tags in SIZES:
+            file_name: str = f"{directory}/auth_{tags}.json"
+            write_auth_file(file_name, tags)
+            id_tag: str = f"{tags - 1:08X}"
+
+            # Cold: the cache is empty until the tags are authorized online again
+            cold: AuthorizationCache = AuthorizationCache(True, file_name, max_cached_tags=tags)
+            is_authorized, _ = await first_tap(cold, id_tag)
+            cold_result: str = "answered from memory" if is_authorized else "miss, needs an Authorize round trip"
+
+            # Warmed: auth.json is read at boot, before the RFID reader starts
+            warm: AuthorizationCache = AuthorizationCache(True, file_name, max_cached_tags=tags)
+            started: float = time.perf_counter()
+            await warm.load()
+            boot_load: float = time.perf_counter() - started
+            is_authorized, warm_tap = await first_tap(warm, id_tag)
+            if not is_authorized:
+                raise RuntimeError(f"Tag {id_tag} is not authorized after the boot load")
+            print(f"{tags:>6} tags: cold first tap {cold_result}; warmed: boot load {boot_load * 1e3:.1f} ms, "
+                  f"first tap {warm_tap * 1e6:.1f} us, {warm.get_statistics['size']} tags cached")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,58 @@
+"""
+Tag lookup in the authorization cache: a linear scan of the tag list, as the cache used to do, vs. the dict index,
+for 100,000 cached tags.
+
+Run from the client directory:
+    python benchmarks/authorization_lookup.py
+"""
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from charge_point.data.auth.authorization_cache import AuthorizationCache
+
+TAGS: int = 100000
+LOOKUPS: int = 250
+
+
+def scan(tags: list, id_tag: str) -> bool:
+    return next((tag["status"] == "Accepted" for tag in tags if tag["id"] == id_tag), False)
+
+
+async def main():
+    directory: str = tempfile.mkdtemp()
+    try:
+        tag_list: list = [{"id_tag": f"{i:08X}",
+                           "id_tag_info": {"status": "Accepted", "expiry_date": "2999-01-01T00:00:00.000Z"}}
+                          for i in range(TAGS)]
+        cache: AuthorizationCache = AuthorizationCache(True, f"{directory}/auth.json",
+                                                       is_local_list_supported=True)
+        cache.set_max_local_tags(TAGS)
+        await cache.update_cached_tags(tag_list, 1, True)
+        tags: list = cache.local_tags
+        random.seed(1)
+        # Mostly known tags and some unknown ones, which scan the whole list
+        lookups: list = [random.choice(tags)["id"] for _ in range(LOOKUPS * 4 // 5)] + ["UNKNOWN"] * (LOOKUPS // 5)
+
+        started: float = time.perf_counter()
+        for id_tag in lookups:
+            scan(tags, id_tag)
+        scan_time: float = (time.perf_counter() - started) / len(lookups)
+
+        started = time.perf_counter()
+        for id_tag in lookups:
+            await cache.is_tag_authorized(id_tag)
+        index_time: float = (time.perf_counter() - started) / len(lookups)
+        print(f"{TAGS} tags: list scan {scan_time * 1e6:.1f} us/lookup, dict index {index_time * 1e6:.2f} us/lookup")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,65 @@
+"""
+Storage load of a charging cycle: number of connectors.json writes and bytes written for a session start and stop,
+with the write-behind flush compared to writing the file on every change.
+
+Run from the client directory:
+    python benchmarks/connector_writes.py
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from charge_point.connectors.ChargingConnector import ConnectorSettingsManager
+
+
+async def charging_cycle(write_through: bool):
+    """
+    Start and stop a session at connector 1 with the same calls the connectors make.
+    :param write_through: Flush after every change, like the client did before the write-behind
+    :return:
+    """
+    async def step(coroutine):
+        await coroutine
+        if write_through:
+            await ConnectorSettingsManager.flush()
+
+    await step(ConnectorSettingsManager.update_connector_status(1, 1, "Preparing"))
+    await step(ConnectorSettingsManager.apply_changes([{"evse_id": 1, "connector_id": 1,
+                                                        "session": {"is_active": True, "transaction_id": "1",
+                                                                    "tag_id": "BENCH", "started": "now"}}]))
+    await step(ConnectorSettingsManager.update_connector_status(1, 1, "Charging"))
+    for energy in range(10):
+        await step(ConnectorSettingsManager.update_energy_register(1, 1, energy * 100.0))
+    await step(ConnectorSettingsManager.apply_changes([{"evse_id": 1, "connector_id": 1, "clear_session": True}]))
+    await step(ConnectorSettingsManager.update_connector_status(1, 1, "Finishing"))
+    await step(ConnectorSettingsManager.update_connector_status(1, 1, "Available"))
+    # Let the pending write-behind flush run
+    await asyncio.sleep(ConnectorSettingsManager.flush_interval + 0.5)
+
+
+async def main():
+    directory: str = tempfile.mkdtemp()
+    original_file: str = ConnectorSettingsManager.file_name
+    try:
+        for write_through in (True, False):
+            ConnectorSettingsManager.file_name = f"{directory}/connectors.json"
+            shutil.copy(original_file, ConnectorSettingsManager.file_name)
+            ConnectorSettingsManager.set_backend("json")
+            ConnectorSettingsManager.set_flush_interval(1)
+            ConnectorSettingsManager.file_writes = 0
+            ConnectorSettingsManager.bytes_written = 0
+            await charging_cycle(write_through)
+            mode: str = "write-through" if write_through else "write-behind"
+            print(f"{mode:>13}: {ConnectorSettingsManager.file_writes} writes, "
+                  f"{ConnectorSettingsManager.bytes_written} bytes per charging cycle")
+    finally:
+        ConnectorSettingsManager.file_name = original_file
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,60 @@
+"""
+Event loop lag under SPI load: 24 simulated power meters with a 4 ms blocking read each are sampled every 200 ms,
+either directly on the event loop or on the per-bus hardware threads, while LoopLagMonitor probes the loop.
+
+Run from the client directory:
+    python benchmarks/loop_lag.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from charge_point.hardware.io_executor import HardwareExecutor, LoopLagMonitor
+
+METERS: int = 24
+READ_TIME: float = 0.004
+SAMPLE_INTERVAL: float = 0.2
+DURATION: float = 3
+
+
+def blocking_read() -> float:
+    # Stands in for a spidev burst read including the chip select toggling
+    time.sleep(READ_TIME)
+    return 1.0
+
+
+async def sample(on_bus_threads: bool):
+    while True:
+        await asyncio.sleep(SAMPLE_INTERVAL)
+        if on_bus_threads:
+            await asyncio.gather(*[HardwareExecutor.run(f"spi{meter % 2}", blocking_read) for meter in range(METERS)])
+        else:
+            for _ in range(METERS):
+                blocking_read()
+
+
+async def measure(on_bus_threads: bool):
+    monitor: LoopLagMonitor = LoopLagMonitor(interval=0.01, report_interval=DURATION * 10,
+                                             warning_threshold=DURATION * 10)
+    tasks: list = [asyncio.ensure_future(monitor.run()), asyncio.ensure_future(sample(on_bus_threads))]
+    await asyncio.sleep(DURATION)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    mode: str = "reads on bus threads" if on_bus_threads else "reads on the loop"
+    print(f"{mode:>20}: mean lag {monitor.statistics.mean * 1000:.2f} ms, "
+          f"max {monitor.statistics.max * 1000:.2f} ms")
+
+
+def main():
+    loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+    loop.run_until_complete(measure(False))
+    loop.run_until_complete(measure(True))
+    HardwareExecutor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
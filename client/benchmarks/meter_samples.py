@@ -0,0 +1,57 @@
+"""
+Memory and throughput of the meter samples of a 24 h session sampled at 1 Hz: the OCPP MeterValue dictionaries
+the session used to keep vs. the columnar MeterSampleBuffer.
+
+Run from the client directory:
+    python benchmarks/meter_samples.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from charge_point.data.meter_samples import MeterSampleBuffer
+
+SAMPLES: int = 86400
+
+
+def append_dictionaries() -> list:
+    meter_values: list = []
+    for i in range(SAMPLES):
+        meter_values.append({"timestamp": datetime.utcnow().isoformat(),
+                             "sampled_value": [{"value": f"{1234.5 + i}", "measurand": "Power.Active.Import"}]})
+    return meter_values
+
+
+def append_buffer() -> MeterSampleBuffer:
+    meter_samples: MeterSampleBuffer = MeterSampleBuffer()
+    for i in range(SAMPLES):
+        meter_samples.append(1234.5 + i, "Power.Active.Import")
+    return meter_samples
+
+
+def measure(name: str, function):
+    tracemalloc.start()
+    started: float = time.perf_counter()
+    result = function()
+    elapsed: float = time.perf_counter() - started
+    memory: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name:>12}: {memory / 1e6:6.1f} MB, {SAMPLES / elapsed / 1e3:7.0f}k appends/s "
+          f"(traced, {SAMPLES} samples)")
+    return result
+
+
+def main():
+    measure("dictionaries", append_dictionaries)
+    meter_samples: MeterSampleBuffer = measure("buffer", append_buffer)
+    started: float = time.perf_counter()
+    meter_samples.to_meter_values()
+    print(f"rendering all samples as MeterValues: {(time.perf_counter() - started) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
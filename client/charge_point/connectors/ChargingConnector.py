@@ -1,11 +1,23 @@
+import asyncio
+import copy
 import json
+import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from aiofiles import open as a_open
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from charge_point.connectors.sampler import ConnectorSampler
+from charge_point.data.energy_register import EnergyRegister
+from charge_point.data.meter_journal import MeterJournal
+from charge_point.data.meter_samples import MeterSampleBuffer
 from charge_point.data.sessions import ChargingSession, Reservation
-from charge_point.hardware.components import Relay, PowerMeter
+from charge_point.data.sqlite_store import SQLiteConnectorStore, SQLiteMeterJournal
+from charge_point.hardware.components import Relay, PowerMeter, MeterSnapshot, PowerMeterFault
+from charge_point.hardware.io_executor import HardwareExecutor
 from charge_point.scheduler import SchedulerManager
+from string_utils import is_full_string
+
+logger = logging.getLogger('chargepi_logger')
 
 
 class ChargingConnector:
@@ -19,7 +31,8 @@ class ChargingConnector:
                  power_meter_voltage_divider_offset: float, power_meter_shunt_offset: float,
                  power_meter_min_power: float,
                  max_charging_time: int,
-                 stop_transaction_function, send_meter_values_function):
+                 stop_transaction_function, send_meter_values_function,
+                 power_meter_interrupt_pin: int = 0, power_meter_energy_register: bool = True):
         self.evse_id: int = evse_id
         self.connector_id: int = connector_id
         self._type: str = conn_type
@@ -30,13 +43,37 @@ class ChargingConnector:
         self._power_meter: PowerMeter = None
         self._power_meter_min_power = power_meter_min_power
         if power_meter_pin > 0:
-            self._power_meter = PowerMeter(power_meter_pin, power_meter_bus,
-                                           power_meter_voltage_divider_offset,
-                                           power_meter_shunt_offset)
+            try:
+                self._power_meter = PowerMeter(power_meter_pin, power_meter_bus,
+                                               power_meter_voltage_divider_offset,
+                                               power_meter_shunt_offset,
+                                               power_meter_interrupt_pin,
+                                               power_meter_energy_register)
+            except PowerMeterFault as ex:
+                logger.error(f"Power meter at connector {evse_id}_{connector_id} is not responding", exc_info=ex)
+                print(ex)
         self._ChargingSession: ChargingSession = ChargingSession()
         self._Reservation: Reservation = None
+        self._meter_journal = None
+        self._journaled_samples: int = 0
+        self._energy_register: EnergyRegister = EnergyRegister(
+            ConnectorSettingsManager.get_energy_register(evse_id, connector_id))
+        self._last_snapshot: MeterSnapshot = None
         self._charging_scheduler: AsyncIOScheduler = SchedulerManager.getScheduler()
         self._connector_status = None
+        self._session_listener = None
+
+    def set_session_listener(self, listener):
+        """
+        Set the listener notified when a session starts or stops, e.g. a ConnectorRegistry.
+        :param listener: Object with session_started(connector) and session_stopped(connector)
+        :return:
+        """
+        self._session_listener = listener
+
+    def _notify_session_started(self):
+        if self._session_listener is not None:
+            self._session_listener.session_started(self)
 
     def start_charging(self, id_tag: str, transaction_id: str = "", meter_sample_time: int = 60,
                        connector_timeout: int = 30) -> str:
@@ -57,10 +94,21 @@ class ChargingConnector:
         :return:
         """
         self._ChargingSession.stop_charging_session()
+        if self._session_listener is not None:
+            self._session_listener.session_stopped(self)
+        if self._meter_journal is not None:
+            self._meter_journal.compact()
+            self._meter_journal = None
         self._relay.off()
         self.__stop_watchdogs()
+        self._last_snapshot = None
         self._Reservation = None
-        self._charging_scheduler.add_job(ConnectorSettingsManager.clear_session, args=[self.evse_id, self.connector_id])
+        self._energy_register.reset_integration()
+        self._charging_scheduler.add_job(ConnectorSettingsManager.apply_changes,
+                                         args=[[{"evse_id": self.evse_id,
+                                                 "connector_id": self.connector_id,
+                                                 "clear_session": True,
+                                                 "energy_register": self.get_energy_register}]])
 
     def resume_charging(self, session_info, meter_sample_time: int = 60, connector_timeout: int = 30):
         """
@@ -77,80 +125,152 @@ class ChargingConnector:
             _max_time_left: int = 60
             print(ex)
         if self.is_charging() and _max_time_left > 0:
+            # Samples stored before the meter journal was introduced are still in the session info
+            meter_samples: MeterSampleBuffer = MeterSampleBuffer()
+            meter_samples.extend_from_meter_values(session_info["consumption"])
+            meter_samples.extend(ConnectorSettingsManager.get_meter_journal(
+                self.evse_id, self.connector_id, session_info["transaction_id"]).replay())
             response = self._ChargingSession.resume_charging_session(tag_id=session_info["tag_id"],
                                                                      transaction_id=session_info["transaction_id"],
-                                                                     meter_samples=session_info["consumption"])
+                                                                     meter_samples=meter_samples,
+                                                                     sample_window=meter_sample_time)
             if response == ChargingSession.SessionResumeSuccess:
+                self._notify_session_started()
+                self._open_meter_journal()
                 self._relay.on()
-                self.__set_watchdogs(meter_sample_time=meter_sample_time,
-                                     connector_timeout=connector_timeout,
-                                     max_charging_time=_max_time_left)
-                self._charging_scheduler.add_job(ConnectorSettingsManager.update_session,
-                                                 args=[self.evse_id, self.connector_id,
-                                                       {
-                                                           "is_active": True,
-                                                           "transaction_id": self.get_current_transaction_id,
-                                                           "tag_id": self.get_current_tag_id
-                                                       }])
+                self._set_watchdogs(meter_sample_time=meter_sample_time,
+                                    connector_timeout=connector_timeout,
+                                    max_charging_time=_max_time_left)
+                self._charging_scheduler.add_job(ConnectorSettingsManager.apply_changes,
+                                                 args=[[{"evse_id": self.evse_id,
+                                                         "connector_id": self.connector_id,
+                                                         "session": {
+                                                             "is_active": True,
+                                                             "transaction_id": self.get_current_transaction_id,
+                                                             "tag_id": self.get_current_tag_id
+                                                         }}]])
             return response
         return ChargingSession.SessionResumeFailure
 
-    def __set_watchdogs(self, meter_sample_time: int, connector_timeout: int, max_charging_time=180):
+    def _open_meter_journal(self):
+        """
+        Open the meter journal of the current session. Samples already in the session are considered journaled.
+        :return:
+        """
+        self._meter_journal = ConnectorSettingsManager.get_meter_journal(self.evse_id, self.connector_id,
+                                                                         self.get_current_transaction_id)
+        self._journaled_samples = len(self._ChargingSession.get_meter_sample_buffer)
+        self._energy_register.reset_integration()
+
+    async def _reset_power_meter(self):
+        """
+        Reset the power meter without blocking the event loop.
+        :return:
+        """
+        try:
+            await self._power_meter.reset_async()
+        except PowerMeterFault as ex:
+            logger.error(f"Power meter at connector {self.evse_id}_{self.connector_id} is not responding",
+                         exc_info=ex)
+            print(ex)
+
+    def _set_watchdogs(self, meter_sample_time: int, connector_timeout: int, max_charging_time=180):
         """
         Set a timer for charging. When the time limit is reached, stop charging.
-        Will stop charging if it is interrupted before the timer ends.
+        Will stop charging if it is interrupted before the timer ends. The meter sampling, reporting and
+        the timers are handled by the shared ConnectorSampler.
         :param connector_timeout: Connector timeout in seconds
         :param meter_sample_time: Sample time in seconds
+        :param max_charging_time: Max charging time in minutes
         :return:
         """
-        pass
+        ConnectorSampler.register(self, meter_sample_time=meter_sample_time,
+                                  connector_timeout=connector_timeout,
+                                  max_charging_time=max_charging_time,
+                                  sample_meter=self._is_sampling_enabled())
 
     def __stop_watchdogs(self):
-        self._charging_scheduler.get_job(
-            job_id=f"charging_watchdog_{self.evse_id}_{self.connector_id}").remove()
-        try:
-            self._charging_scheduler.get_job(
-                job_id=f"meter_sampling_{self.evse_id}_{self.connector_id}").remove()
-            self._charging_scheduler.get_job(
-                job_id=f"update_meter_values_{self.evse_id}_{self.connector_id}").remove()
-            self._charging_scheduler.get_job(
-                job_id=f"connector_timeout_{self.evse_id}_{self.connector_id}").remove()
-        except Exception as e:
-            print(e)
+        ConnectorSampler.unregister(self)
+
+    def _is_sampling_enabled(self) -> bool:
+        return isinstance(self._power_meter, PowerMeter)
+
+    def _on_max_charging_time(self):
+        """
+        Called when the max charging time is reached.
+        :return:
+        """
+        pass
 
     async def _update_meter_values(self):
         """
         Sample the meter values and monitor if the connector is still charging. If not, wait for the timeout.
         :return:
         """
-        job_id = f"charging_watchdog_{self.evse_id}_{self.connector_id}"
-        if self._charging_scheduler.get_job(job_id).next_run_time is None or not self.is_charging():
+        if not ConnectorSampler.is_registered(self) or not self.is_charging():
             return
         print(f"Notifying central system about the power consumption {self.get_max_sample}")
         await self._send_meter_values_function(self.connector_id, [{"timestamp": datetime.utcnow().isoformat(),
                                                                     "sampled_value": [
                                                                         {
                                                                             "value": f"{self.get_max_sample}"
-                                                                        }]
+                                                                        },
+                                                                        {
+                                                                            "value": f"{int(self.get_energy_register)}",
+                                                                            "measurand": "Energy.Active.Import.Register",
+                                                                            "unit": "Wh"
+                                                                        },
+                                                                        *self.__get_snapshot_sampled_values()]
                                                                     }])
-        await ConnectorSettingsManager.update_session_attribute(evse_id=self.evse_id,
-                                                                connector_id=self.connector_id,
-                                                                key="consumption",
-                                                                value=self.get_meter_samples)
-
-    def _sample_meter(self):
+        await ConnectorSettingsManager.update_energy_register(self.evse_id, self.connector_id,
+                                                              self.get_energy_register)
+        # Only append the samples taken since the last update to the journal
+        if self._meter_journal is not None:
+            meter_journal = self._meter_journal
+            meter_samples: MeterSampleBuffer = self._ChargingSession.get_meter_sample_buffer
+            # Advance the index before the write, so an overlapping update doesn't append the same samples
+            start: int = self._journaled_samples
+            records: list = meter_samples.get_records(start)
+            self._journaled_samples = start + len(records)
+            try:
+                await meter_journal.append(records)
+            except Exception:
+                if self._meter_journal is meter_journal:
+                    self._journaled_samples = min(self._journaled_samples, start)
+                raise
+
+    async def _sample_meter(self):
         """
         Sample the power meter periodically each second and add energy to consumption.
+        The meter is read in the worker thread of its SPI bus. Samples are skipped while the meter is reset,
+        the registers are not valid until the conversion starts again.
         :return:
         """
-        if isinstance(self._power_meter, PowerMeter):
-            print(f"Power: {self._power_meter.get_current_power_draw()}")
-            power_draw = self.get_power_draw
-            self._ChargingSession.add_power_sample(power_draw)
-            if power_draw > 0:
-                self._ChargingSession.add_meter_sample(power_draw)
+        if isinstance(self._power_meter, PowerMeter) and not self._power_meter.is_resetting:
+            snapshot: MeterSnapshot = await HardwareExecutor.run(f"spi{self._power_meter.bus}",
+                                                                 self._power_meter.read_snapshot)
+            self._last_snapshot = snapshot
+            print(f"Power: {snapshot.power}")
+            self._ChargingSession.add_power_sample(snapshot.power)
+            if snapshot.power > 0:
+                self._ChargingSession.add_meter_sample(snapshot.power)
+            # Prefer the energy measured by the chip over integrating the samples
+            if self._power_meter.has_energy_register:
+                self._energy_register.add_energy(snapshot.energy)
+            else:
+                self._energy_register.add_power_sample(snapshot.power)
 
-    def __check_if_connector_plugged(self):
+    def __get_snapshot_sampled_values(self) -> list:
+        """
+        Current and voltage from the last meter snapshot, they are read in the same burst as the power.
+        :return: List of sampled values
+        """
+        if self._last_snapshot is None:
+            return []
+        return [{"value": f"{self._last_snapshot.rms_current:.2f}", "measurand": "Current.Import", "unit": "A"},
+                {"value": f"{self._last_snapshot.rms_voltage:.2f}", "measurand": "Voltage", "unit": "V"}]
+
+    def _check_if_connector_plugged(self):
         """
         Check if the connector is (re)connected and drawing power.
         :return:
@@ -258,6 +378,13 @@ class ChargingConnector:
             return self._power_meter.get_energy_consumption()
         return 0.0
 
+    @property
+    def get_energy_register(self) -> float:
+        """
+        Energy.Active.Import.Register of the connector in Wh.
+        """
+        return self._energy_register.value
+
     @property
     def get_meter_samples(self) -> list:
         return self._ChargingSession.get_meter_samples
@@ -268,18 +395,38 @@ class ChargingConnector:
 
     @property
     def get_power_draw(self) -> float:
-        if isinstance(self._power_meter, PowerMeter):
-            return self._power_meter.get_current_power_draw()
+        """
+        Power from the last meter snapshot, so reading it does not access the SPI bus.
+        """
+        if self._last_snapshot is not None:
+            return self._last_snapshot.power
         return 0.0
 
     @property
     def get_avg_power(self) -> float:
         return self._ChargingSession.get_avg_power
 
+    @property
+    def get_recent_avg_power(self) -> float:
+        return self._ChargingSession.get_recent_avg_power
+
     @property
     def get_session_started(self) -> str:
         return self._ChargingSession.get_session_started
 
+    @property
+    def get_charging_progress(self) -> float:
+        """
+        Elapsed part of the max charging time, between 0 and 1.
+        """
+        if not self._ChargingSession.is_active or self._max_charging_time <= 0:
+            return 0.0
+        try:
+            elapsed: float = (datetime.now() - datetime.fromisoformat(self.get_session_started)).total_seconds()
+        except ValueError:
+            return 0.0
+        return min(elapsed / (self._max_charging_time * 60), 1.0)
+
     def has_reservation(self, reservation_id: str) -> bool:
         if isinstance(self._Reservation, Reservation):
             return self._Reservation.get_reservation_id == str(reservation_id)
@@ -292,11 +439,184 @@ class ChargingConnector:
 
 class ConnectorSettingsManager:
     """
-    A singleton class for I/O operations for the connectors.json file.
-    Performs status change and session information write to the file.
+    A singleton class for I/O operations for the connectors.json file or the SQLite database, if configured.
+    Keeps an in-memory copy of the EVSEs and connectors, which is authoritative while the client is running.
+    Status changes and session updates only modify the in-memory copy and mark it dirty. A flush job writes
+    the changes back to the storage at most once per flush interval.
     """
     path = os.path.dirname(os.path.realpath(__file__))
     file_name = "{path}/connectors.json".format(path=path)
+    flush_interval: int = 5
+    # Number of attempts of the durable writes in apply_changes
+    write_attempts: int = 3
+    __flush_job_id: str = "flush_connector_settings"
+    __evses: list = None
+    __connector_index: dict = {}
+    __is_dirty: bool = False
+    # Serializes the writes, created on first flush in the running event loop
+    __flush_lock: asyncio.Lock = None
+    __store: SQLiteConnectorStore = None
+    # Write statistics, used to measure the storage load of a charging cycle
+    bytes_written: int = 0
+    file_writes: int = 0
+
+    @staticmethod
+    def set_flush_interval(flush_interval: int):
+        """
+        Set the minimum interval between two writes to the connectors.json file.
+        :param flush_interval: Interval in seconds, 0 writes the changes as soon as possible
+        :return:
+        """
+        if flush_interval >= 0:
+            ConnectorSettingsManager.flush_interval = flush_interval
+
+    @staticmethod
+    def set_backend(backend: str, database_file: str = ""):
+        """
+        Select the storage backend. The JSON file is the default. When the SQLite database is selected and empty,
+        the connectors and sessions are imported from connectors.json.
+        :param backend: "json" or "sqlite"
+        :param database_file: Path of the SQLite database
+        :return:
+        """
+        if backend != "sqlite":
+            ConnectorSettingsManager.__store = None
+        else:
+            if not is_full_string(database_file):
+                database_file = f"{ConnectorSettingsManager.path}/connectors.db"
+            store: SQLiteConnectorStore = SQLiteConnectorStore(database_file)
+            if store.is_empty():
+                with open(ConnectorSettingsManager.file_name, "r") as connector_file:
+                    store.import_from_json(json.loads(connector_file.read())["EVSEs"])
+                    connector_file.close()
+            ConnectorSettingsManager.__store = store
+        # Reload from the selected backend on next access
+        ConnectorSettingsManager.__evses = None
+
+    @staticmethod
+    def get_meter_journal(evse_id: int, connector_id: int, transaction_id: str):
+        """
+        Get the meter journal of a session for the selected backend.
+        :return: MeterJournal or SQLiteMeterJournal
+        """
+        if ConnectorSettingsManager.__store is not None:
+            return SQLiteMeterJournal(ConnectorSettingsManager.__store, evse_id, connector_id, transaction_id)
+        return MeterJournal(evse_id, connector_id, transaction_id)
+
+    @staticmethod
+    def __load_evses() -> list:
+        """
+        Read the EVSEs from the storage into memory on first access.
+        :return: In-memory list of EVSEs
+        """
+        if ConnectorSettingsManager.__evses is None:
+            if ConnectorSettingsManager.__store is not None:
+                evses: list = ConnectorSettingsManager.__store.load_evses()
+            else:
+                with open(ConnectorSettingsManager.file_name, "r") as connector_file:
+                    evses = json.loads(connector_file.read())["EVSEs"]
+                    connector_file.close()
+            ConnectorSettingsManager.__connector_index = {(evse["id"], connector["id"]): connector
+                                                          for evse in evses for connector in evse["connectors"]}
+            ConnectorSettingsManager.__evses = evses
+        return ConnectorSettingsManager.__evses
+
+    @staticmethod
+    def __find_connector(evse_id: int, connector_id: int) -> dict:
+        ConnectorSettingsManager.__load_evses()
+        return ConnectorSettingsManager.__connector_index.get((evse_id, connector_id), None)
+
+    @staticmethod
+    def __mark_dirty(delay: float = None):
+        """
+        Mark the in-memory state as changed and schedule a flush, unless one is already pending.
+        :param delay: Time in seconds until the flush, the flush interval by default
+        :return:
+        """
+        ConnectorSettingsManager.__is_dirty = True
+        if delay is None:
+            delay = ConnectorSettingsManager.flush_interval
+        scheduler: AsyncIOScheduler = SchedulerManager.getScheduler()
+        if scheduler.get_job(ConnectorSettingsManager.__flush_job_id) is None:
+            scheduler.add_job(ConnectorSettingsManager.flush, 'date',
+                              run_date=(datetime.now() + timedelta(seconds=delay)),
+                              id=ConnectorSettingsManager.__flush_job_id)
+
+    @staticmethod
+    def __empty_session() -> dict:
+        return {
+            "is_active": False,
+            "transaction_id": "",
+            "tag_id": "",
+            "started": "",
+            "consumption": []
+        }
+
+    @staticmethod
+    def __apply_change(change: dict) -> bool:
+        """
+        Apply a single change to the in-memory state. The change is a dictionary with the following structure:
+        {
+            "evse_id": 1,
+            "connector_id": 1,
+            "status": "Charging",   # optional
+            "clear_session": False, # optional, resets the session before applying the session attributes
+            "session": {},          # optional, session attributes to update
+            "energy_register": 0.0  # optional, energy register in Wh
+        }
+        :param change: Change to apply
+        :return: True if the state changed
+        """
+        connector: dict = ConnectorSettingsManager.__find_connector(change["evse_id"], change["connector_id"])
+        if connector is None:
+            return False
+        is_changed: bool = False
+        if "status" in change.keys() and connector["status"] != change["status"]:
+            connector["status"] = change["status"]
+            is_changed = True
+        if change.get("clear_session", False):
+            connector["session"] = ConnectorSettingsManager.__empty_session()
+            is_changed = True
+        for key, value in change.get("session", {}).items():
+            if key in connector["session"].keys():
+                connector["session"][key] = value
+                is_changed = True
+        if "energy_register" in change.keys():
+            power_meter: dict = connector["power_meter"]
+            consumption: float = change["energy_register"]
+            if power_meter.get("power_units", "Wh") == "kWh":
+                consumption /= 1000
+            if power_meter.get("consumption", 0) != consumption:
+                power_meter["consumption"] = consumption
+                is_changed = True
+        return is_changed
+
+    @staticmethod
+    async def apply_changes(changes: list):
+        """
+        Apply multiple connector and session changes at once and write them to connectors.json with a single write.
+        Use it for changes that must survive a power loss, like the start and the end of a session.
+        The write is retried with a backoff, the changes stay in memory and are flushed later if all attempts fail.
+        :param changes: List of changes, see __apply_change for the structure
+        :raises Exception: The error of the last write attempt
+        :return:
+        """
+        is_changed: bool = False
+        for change in changes:
+            is_changed = ConnectorSettingsManager.__apply_change(change) or is_changed
+        if not is_changed:
+            return
+        ConnectorSettingsManager.__is_dirty = True
+        for attempt in range(1, ConnectorSettingsManager.write_attempts + 1):
+            try:
+                await ConnectorSettingsManager.__flush()
+                return
+            except Exception as ex:
+                logger.warning(f"Writing connector settings failed, attempt {attempt}", exc_info=ex)
+                if attempt == ConnectorSettingsManager.write_attempts:
+                    ConnectorSettingsManager.__mark_dirty(max(ConnectorSettingsManager.flush_interval, 1))
+                    raise
+                await asyncio.sleep(0.1 * 2 ** attempt)
 
     @staticmethod
     def get_evses() -> list:
@@ -304,11 +624,7 @@ class ConnectorSettingsManager:
         Get connectors from connectors.json
         :return:
         """
-        with open(ConnectorSettingsManager.file_name, "r") as connector_file:
-            file = connector_file.read()
-            evses = json.loads(file)["EVSEs"]
-            connector_file.close()
-            return evses
+        return copy.deepcopy(ConnectorSettingsManager.__load_evses())
 
     @staticmethod
     def get_evse_with_id(evse_id: int) -> dict:
@@ -316,7 +632,8 @@ class ConnectorSettingsManager:
         Get connectors from connectors.json
         :return:
         """
-        return next((evse for evse in ConnectorSettingsManager.get_evses() if evse["id"] == evse_id), None)
+        evse: dict = next((evse for evse in ConnectorSettingsManager.__load_evses() if evse["id"] == evse_id), None)
+        return copy.deepcopy(evse)
 
     @staticmethod
     def get_connectors_from_evse(evse_id: int) -> list:
@@ -339,7 +656,7 @@ class ConnectorSettingsManager:
         evses: list = ConnectorSettingsManager.get_evses()
         connector_list: list = []
         for evse in evses:
-            connector_list.extend(ConnectorSettingsManager.get_connectors_from_evse(evse.evse_id))
+            connector_list.extend(evse["connectors"])
         return connector_list
 
     @staticmethod
@@ -348,11 +665,9 @@ class ConnectorSettingsManager:
         Get connector status from connectors.json
         :return:
         """
-        evse: dict = ConnectorSettingsManager.get_evse_with_id(evse_id)
-        if evse is not None:
-            for connector in evse["connectors"]:
-                if connector["id"] == connector_id:
-                    return connector["status"], connector["session"]
+        connector: dict = ConnectorSettingsManager.__find_connector(evse_id, connector_id)
+        if connector is not None:
+            return connector["status"], copy.deepcopy(connector["session"])
         return "NoConnectorFound", {}
 
     @staticmethod
@@ -361,29 +676,125 @@ class ConnectorSettingsManager:
         Get session information from connectors.json
         :return:
         """
-        evse: dict = ConnectorSettingsManager.get_evse_with_id(evse_id)
-        for connector in evse["connectors"]:
-            if connector["id"] == connector_id:
-                return connector["session"]
+        connector: dict = ConnectorSettingsManager.__find_connector(evse_id, connector_id)
+        if connector is not None:
+            return copy.deepcopy(connector["session"])
         return {}
 
     @staticmethod
     async def update_connector_status(evse_id: int, connector_id: int, status: str):
-        async with a_open(ConnectorSettingsManager.file_name, "r") as connector_settings:
-            file = json.loads(await connector_settings.read())
-            await connector_settings.close()
-            for evse in file["EVSEs"]:
-                if evse["id"] == evse_id:
-                    for connector in evse["connectors"]:
-                        if connector["id"] == connector_id:
-                            connector["status"] = status
-            await ConnectorSettingsManager.__write_to_file(file)
+        if ConnectorSettingsManager.__apply_change({"evse_id": evse_id,
+                                                   "connector_id": connector_id,
+                                                   "status": status}):
+            ConnectorSettingsManager.__mark_dirty()
+
+    @staticmethod
+    async def flush():
+        """
+        Write the in-memory state to the storage if it changed since the last write.
+        :return:
+        """
+        try:
+            await ConnectorSettingsManager.__flush()
+        except Exception as ex:
+            logger.error("Failed writing connector settings", exc_info=ex)
+            print(ex)
+            # Retry later, a failing flush job may still be running when the retry is due
+            ConnectorSettingsManager.__mark_dirty(max(ConnectorSettingsManager.flush_interval, 1))
+
+    @staticmethod
+    async def __flush():
+        """
+        Write the in-memory state to the storage, one write at a time.
+        :raises Exception: If the write failed, the state stays dirty
+        :return:
+        """
+        if ConnectorSettingsManager.__flush_lock is None:
+            ConnectorSettingsManager.__flush_lock = asyncio.Lock()
+        async with ConnectorSettingsManager.__flush_lock:
+            if not ConnectorSettingsManager.__is_dirty or ConnectorSettingsManager.__evses is None:
+                return
+            ConnectorSettingsManager.__is_dirty = False
+            try:
+                # Take the snapshot while holding the lock, the changes made during the write go to the next flush
+                if ConnectorSettingsManager.__store is not None:
+                    evses: list = copy.deepcopy(ConnectorSettingsManager.__evses)
+                    await asyncio.get_event_loop().run_in_executor(None, ConnectorSettingsManager.__store.save_evses,
+                                                                   evses)
+                else:
+                    await ConnectorSettingsManager.__write_to_file(
+                        json.dumps({"EVSEs": ConnectorSettingsManager.__evses}, indent=2))
+            except Exception:
+                ConnectorSettingsManager.__is_dirty = True
+                raise
+
+    @staticmethod
+    def flush_sync():
+        """
+        Blocking variant of flush for the cleanup and reset paths, where the scheduler might not be running anymore.
+        :return:
+        """
+        if not ConnectorSettingsManager.__is_dirty or ConnectorSettingsManager.__evses is None:
+            return
+        if ConnectorSettingsManager.__store is not None:
+            ConnectorSettingsManager.__store.save_evses(ConnectorSettingsManager.__evses)
+            ConnectorSettingsManager.__is_dirty = False
+            return
+        temp_file_name: str = f"{ConnectorSettingsManager.file_name}.tmp"
+        content: str = json.dumps({"EVSEs": ConnectorSettingsManager.__evses}, indent=2)
+        with open(temp_file_name, "w") as w_connector_settings:
+            w_connector_settings.write(content)
+            w_connector_settings.flush()
+            os.fsync(w_connector_settings.fileno())
+        os.replace(temp_file_name, ConnectorSettingsManager.file_name)
+        ConnectorSettingsManager.__is_dirty = False
+        ConnectorSettingsManager.__count_write(content)
+
+    @staticmethod
+    def __count_write(content: str):
+        ConnectorSettingsManager.bytes_written += len(content.encode())
+        ConnectorSettingsManager.file_writes += 1
 
     @staticmethod
-    async def __write_to_file(content):
-        async with a_open(ConnectorSettingsManager.file_name, "w") as w_connector_settings:
-            await w_connector_settings.write(json.dumps(content, indent=2))
+    async def __write_to_file(content: str):
+        # Write to a temporary file first, so a power loss during the write cannot corrupt connectors.json
+        temp_file_name: str = f"{ConnectorSettingsManager.file_name}.tmp"
+        async with a_open(temp_file_name, "w") as w_connector_settings:
+            await w_connector_settings.write(content)
+            await w_connector_settings.flush()
+            os.fsync(w_connector_settings.fileno())
             await w_connector_settings.close()
+        os.replace(temp_file_name, ConnectorSettingsManager.file_name)
+        ConnectorSettingsManager.__count_write(content)
+
+    @staticmethod
+    def get_energy_register(evse_id: int, connector_id: int) -> float:
+        """
+        Get the stored energy register of the connector's power meter in Wh.
+        :return:
+        """
+        connector: dict = ConnectorSettingsManager.__find_connector(evse_id, connector_id)
+        if connector is None:
+            return 0.0
+        power_meter: dict = connector["power_meter"]
+        consumption: float = float(power_meter.get("consumption", 0))
+        if power_meter.get("power_units", "Wh") == "kWh":
+            consumption *= 1000
+        return consumption
+
+    @staticmethod
+    async def update_energy_register(evse_id: int, connector_id: int, energy: float):
+        """
+        Update the energy register of the connector's power meter.
+        :param evse_id:
+        :param connector_id:
+        :param energy: Energy register value in Wh
+        :return:
+        """
+        if ConnectorSettingsManager.__apply_change({"evse_id": evse_id,
+                                                   "connector_id": connector_id,
+                                                   "energy_register": energy}):
+            ConnectorSettingsManager.__mark_dirty()
 
     @staticmethod
     async def update_session_attribute(evse_id: int, connector_id: int, key, value):
@@ -395,15 +806,10 @@ class ConnectorSettingsManager:
         :param value:
         :return:
         """
-        async with a_open(ConnectorSettingsManager.file_name, "r") as connector_settings:
-            file = json.loads(await connector_settings.read())
-            await connector_settings.close()
-            for evse in file["EVSEs"]:
-                if evse["id"] == evse_id:
-                    for index, connector in enumerate(evse["connectors"]):
-                        if connector["id"] == connector_id and key in connector["session"].keys():
-                            connector["session"][key] = value
-            await ConnectorSettingsManager.__write_to_file(file)
+        if ConnectorSettingsManager.__apply_change({"evse_id": evse_id,
+                                                   "connector_id": connector_id,
+                                                   "session": {key: value}}):
+            ConnectorSettingsManager.__mark_dirty()
 
     @staticmethod
     async def update_session(evse_id: int, connector_id: int, session_info: dict):
@@ -421,8 +827,10 @@ class ConnectorSettingsManager:
         :param session_info:
         :return:
         """
-        for key in session_info.keys():
-            await ConnectorSettingsManager.update_session_attribute(evse_id, connector_id, key, session_info[key])
+        if ConnectorSettingsManager.__apply_change({"evse_id": evse_id,
+                                                   "connector_id": connector_id,
+                                                   "session": session_info}):
+            ConnectorSettingsManager.__mark_dirty()
 
     @staticmethod
     async def clear_session(evse_id: int, connector_id: int):
@@ -432,29 +840,27 @@ class ConnectorSettingsManager:
         :param connector_id:
         :return:
         """
-        async with a_open(ConnectorSettingsManager.file_name, "r") as connector_settings:
-            file = json.loads(await connector_settings.read())
-            await connector_settings.close()
-            for evse in file["EVSEs"]:
-                if evse["id"] == evse_id:
-                    for connector in evse["connectors"]:
-                        if connector["id"] == connector_id:
-                            connector["session"] = {
-                                "is_active": False,
-                                "transaction_id": "",
-                                "tag_id": "",
-                                "started": "",
-                                "consumption": []
-                            }
-            await ConnectorSettingsManager.__write_to_file(file)
+        if ConnectorSettingsManager.__apply_change({"evse_id": evse_id,
+                                                   "connector_id": connector_id,
+                                                   "clear_session": True}):
+            ConnectorSettingsManager.__mark_dirty()
 
     @staticmethod
-    async def find_connector_with_transaction_id(transaction_id) -> ChargingConnector:
-        async with a_open(ConnectorSettingsManager.file_name, "r") as connector_settings:
-            file = json.loads(await connector_settings.read())
-            await connector_settings.close()
-            for evse in file["EVSEs"]:
-                for connector in evse["connectors"]:
-                    if connector["session"]["transaction_id"] == transaction_id:
-                        return connector
-            return None
+    async def find_connector_with_transaction_id(transaction_id) -> dict:
+        """
+        Find the connector with the transaction ID. The in-memory state is searched first, since the database
+        is only updated when the changes are flushed.
+        :param transaction_id: Transaction ID
+        :return: Copy of the connector or None
+        """
+        ConnectorSettingsManager.__load_evses()
+        for connector in ConnectorSettingsManager.__connector_index.values():
+            if connector["session"]["transaction_id"] == transaction_id:
+                return copy.deepcopy(connector)
+        if ConnectorSettingsManager.__store is not None:
+            # Fall back to the transaction ID index of the database
+            ids = ConnectorSettingsManager.__store.find_connector_with_transaction_id(transaction_id)
+            connector: dict = ConnectorSettingsManager.__find_connector(*ids) if ids is not None else None
+            if connector is not None and connector["session"]["transaction_id"] == transaction_id:
+                return copy.deepcopy(connector)
+        return None
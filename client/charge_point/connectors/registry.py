@@ -0,0 +1,107 @@
+import logging
+import threading
+
+logger = logging.getLogger('chargepi_logger')
+
+
+class ConnectorRegistry:
+    """
+    Connectors of a charge point indexed by (EVSE ID, connector ID), by the tag and by the transaction ID
+    of their active session. Connectors report the start and the end of their sessions to the registry,
+    which updates the tag and transaction indexes together.
+    """
+
+    def __init__(self):
+        self.__lock: threading.Lock = threading.Lock()
+        self._connectors: list = []
+        # (EVSE ID, connector ID) -> connector
+        self._by_id: dict = {}
+        # EVSE ID -> list of connectors
+        self._by_evse: dict = {}
+        self._by_tag: dict = {}
+        self._by_transaction_id: dict = {}
+        # (EVSE ID, connector ID) -> (tag ID, transaction ID) of the active session
+        self._sessions: dict = {}
+
+    def add(self, connector):
+        """
+        Add a connector to the registry and start listening to its sessions.
+        :param connector: A charging connector
+        :return:
+        """
+        key: tuple = (connector.evse_id, connector.connector_id)
+        with self.__lock:
+            if key in self._by_id:
+                return
+            self._by_id[key] = connector
+            self._by_evse.setdefault(connector.evse_id, []).append(connector)
+            self._connectors.append(connector)
+            self._connectors.sort(key=(lambda conn: (conn.evse_id, conn.connector_id)))
+        connector.set_session_listener(self)
+
+    def get(self, evse_id: int, connector_id: int):
+        return self._by_id.get((evse_id, connector_id))
+
+    @property
+    def get_connectors(self) -> list:
+        return self._connectors
+
+    def get_evse_connectors(self, evse_id: int) -> list:
+        return self._by_evse.get(evse_id, [])
+
+    def find_with_tag_id(self, id_tag: str):
+        return self._by_tag.get(id_tag)
+
+    def find_with_transaction_id(self, transaction_id: str):
+        return self._by_transaction_id.get(str(transaction_id))
+
+    def get_active_sessions(self) -> list:
+        """
+        Get the connectors with an active session.
+        :return: List of connectors
+        """
+        return [self._by_id[key] for key in self._sessions]
+
+    def get_charging(self) -> list:
+        return [connector for connector in self.get_active_sessions() if connector.is_charging()]
+
+    def session_started(self, connector):
+        """
+        Index the tag and the transaction ID of a connector's session.
+        :param connector: A connector which started or resumed charging
+        :return:
+        """
+        key: tuple = (connector.evse_id, connector.connector_id)
+        tag_id: str = connector.get_current_tag_id
+        transaction_id: str = str(connector.get_current_transaction_id)
+        with self.__lock:
+            self.__remove_session(key)
+            self._sessions[key] = (tag_id, transaction_id)
+            self._by_tag.setdefault(tag_id, connector)
+            self._by_transaction_id[transaction_id] = connector
+        logger.debug(f"Indexed session {transaction_id} at connector {key}")
+
+    def session_stopped(self, connector):
+        """
+        Remove a connector's session from the indexes.
+        :param connector: A connector which stopped charging
+        :return:
+        """
+        with self.__lock:
+            self.__remove_session((connector.evse_id, connector.connector_id))
+
+    def __remove_session(self, key: tuple):
+        tag_id, transaction_id = self._sessions.pop(key, (None, None))
+        connector = self._by_id.get(key)
+        if self._by_tag.get(tag_id) is connector:
+            del self._by_tag[tag_id]
+            # Another connector may be charging with the same tag
+            for other_key, (other_tag_id, _) in self._sessions.items():
+                if other_tag_id == tag_id:
+                    self._by_tag[tag_id] = self._by_id[other_key]
+                    break
+        if self._by_transaction_id.get(transaction_id) is connector:
+            del self._by_transaction_id[transaction_id]
+
+    def __len__(self) -> int:
+        return len(self._connectors)
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger('chargepi_logger')
+
+
+class TimerWheel:
+    """
+    A hashed timer wheel with a resolution of one tick. Timers are stored in the slot of their deadline with the number
+    of full rotations left, so scheduling, cancelling and advancing the wheel do not depend on the number of timers.
+    """
+
+    def __init__(self, slots: int = 64):
+        self._slots: list = [{} for _ in range(slots)]
+        # Key -> slot index of the timer
+        self._timers: dict = {}
+        self._current_tick: int = 0
+
+    def schedule(self, key, delay: int, callback):
+        """
+        Schedule a callback after a number of ticks. An existing timer with the same key is replaced.
+        :param key: Unique key of the timer
+        :param delay: Delay in ticks
+        :param callback: Function called when the timer expires
+        :return:
+        """
+        self.cancel(key)
+        delay = max(int(delay), 1)
+        slot: int = (self._current_tick + delay) % len(self._slots)
+        self._slots[slot][key] = [(delay - 1) // len(self._slots), callback]
+        self._timers[key] = slot
+
+    def cancel(self, key):
+        slot: int = self._timers.pop(key, None)
+        if slot is not None:
+            self._slots[slot].pop(key, None)
+
+    def advance(self) -> list:
+        """
+        Advance the wheel by one tick.
+        :return: List of expired callbacks
+        """
+        self._current_tick += 1
+        slot: dict = self._slots[self._current_tick % len(self._slots)]
+        expired: list = []
+        for key, timer in list(slot.items()):
+            if timer[0] == 0:
+                expired.append(timer[1])
+                del slot[key]
+                del self._timers[key]
+            else:
+                timer[0] -= 1
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+
+class ConnectorSampler:
+    """
+    A singleton sampling loop shared by all charging connectors. Each tick the meters of all the registered connectors
+    are read in a single pass, while reporting, connector timeout and max charging time deadlines are kept
+    in a timer wheel driven by the monotonic clock.
+    """
+    tick: float = 1.0
+    __connectors: dict = {}
+    __timer_wheel: TimerWheel = TimerWheel()
+    __task: asyncio.Task = None
+
+    @staticmethod
+    def register(connector, meter_sample_time: int, connector_timeout: int, max_charging_time: int,
+                 sample_meter: bool = True):
+        """
+        Start sampling the connector and watching its deadlines.
+        :param connector: Charging connector
+        :param meter_sample_time: Meter values reporting interval in seconds
+        :param connector_timeout: Connector timeout in seconds
+        :param max_charging_time: Max charging time in minutes, 0 for no limit
+        :param sample_meter: Sample the power meter and report the meter values
+        :return:
+        """
+        ConnectorSampler.unregister(connector)
+        key = (connector.evse_id, connector.connector_id)
+        ConnectorSampler.__connectors[key] = (connector, sample_meter)
+        ConnectorSampler.__schedule_periodic((key, "max_charging_time"), max_charging_time * 60,
+                                             connector._on_max_charging_time)
+        if sample_meter:
+            ConnectorSampler.__schedule_periodic((key, "meter_values"), meter_sample_time,
+                                                 connector._update_meter_values)
+            ConnectorSampler.__schedule_periodic((key, "connector_timeout"), connector_timeout,
+                                                 connector._check_if_connector_plugged)
+        if ConnectorSampler.__task is None or ConnectorSampler.__task.done():
+            ConnectorSampler.__task = asyncio.ensure_future(ConnectorSampler.__run())
+
+    @staticmethod
+    def unregister(connector):
+        key = (connector.evse_id, connector.connector_id)
+        ConnectorSampler.__connectors.pop(key, None)
+        for deadline in ["max_charging_time", "meter_values", "connector_timeout"]:
+            ConnectorSampler.__timer_wheel.cancel((key, deadline))
+
+    @staticmethod
+    def is_registered(connector) -> bool:
+        return (connector.evse_id, connector.connector_id) in ConnectorSampler.__connectors
+
+    @staticmethod
+    def __schedule_periodic(key, interval: float, callback):
+        # An interval of 0 disables the deadline, e.g. no max charging time
+        if interval <= 0:
+            return
+        ticks: int = max(round(interval / ConnectorSampler.tick), 1)
+
+        def expired():
+            ConnectorSampler.__timer_wheel.schedule(key, ticks, expired)
+            return callback()
+
+        ConnectorSampler.__timer_wheel.schedule(key, ticks, expired)
+
+    @staticmethod
+    async def __sample():
+        connectors: list = [connector for connector, sample_meter in ConnectorSampler.__connectors.values()
+                            if sample_meter]
+        # Meters on different buses are read concurrently
+        results: list = await asyncio.gather(*[connector._sample_meter() for connector in connectors],
+                                             return_exceptions=True)
+        for connector, result in zip(connectors, results):
+            if isinstance(result, Exception):
+                logger.debug(f"Sampling failed at {connector.evse_id}_{connector.connector_id}", exc_info=result)
+
+    @staticmethod
+    def __advance():
+        for callback in ConnectorSampler.__timer_wheel.advance():
+            try:
+                result = callback()
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as ex:
+                logger.debug("Connector deadline failed", exc_info=ex)
+
+    @staticmethod
+    async def __run():
+        started: float = time.monotonic()
+        ticks: int = 0
+        while len(ConnectorSampler.__connectors) > 0:
+            await asyncio.sleep(max(started + (ticks + 1) * ConnectorSampler.tick - time.monotonic(), 0))
+            await ConnectorSampler.__sample()
+            # Catch up with the ticks missed while the event loop was busy, but sample only once
+            due_ticks: int = int((time.monotonic() - started) / ConnectorSampler.tick)
+            while ticks < due_ticks:
+                ConnectorSampler.__advance()
+                ticks += 1
@@ -1,46 +1,315 @@
+import builtins
 import json
 import asyncio
+import heapq
 import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from aiofiles import open
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from string_utils import is_full_string
+from charge_point.scheduler import SchedulerManager
 import os
 
 path = os.path.dirname(os.path.realpath(__file__))
 logger = logging.getLogger('chargepi_logger')
 
 
+def parse_expiry_date(expiry_date: str) -> float:
+    """
+    Parse an OCPP expiry date, e.g. 2021-05-01T10:00:00.000Z, to a POSIX timestamp.
+    :param expiry_date: ISO 8601 date, dates without a time zone are in local time
+    :return: Timestamp or infinity if there is no valid expiry date
+    """
+    if not is_full_string(expiry_date):
+        return math.inf
+    try:
+        value: str = re.sub(r"Z$", "+00:00", expiry_date.strip())
+        # fromisoformat only accepts 3 or 6 fractional digits
+        value = re.sub(r"\.(\d+)", lambda match: "." + (match.group(1) + "000000")[:6], value)
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError as ex:
+        logger.debug(f"Invalid expiry date {expiry_date}", exc_info=ex)
+        return math.inf
+
+
+class CachedTag:
+    """
+    Authorization info of a tag with the expiry date parsed once.
+    """
+    __slots__ = ("id", "status", "expiry_date", "expires")
+
+    def __init__(self, id_tag: str, status: str, expiry_date: str = None):
+        self.id: str = id_tag
+        self.status: str = status
+        self.expiry_date: str = expiry_date
+        self.expires: float = parse_expiry_date(expiry_date)
+
+    @staticmethod
+    def from_dict(tag: dict):
+        return CachedTag(tag["id"], tag["status"], tag.get("expiry_date"))
+
+    def to_dict(self) -> dict:
+        tag: dict = {"id": self.id,
+                     "status": self.status}
+        if self.expiry_date is not None:
+            tag["expiry_date"] = self.expiry_date
+        return tag
+
+    def is_accepted(self, now: float = None) -> bool:
+        """
+        Check if the tag is accepted and not expired.
+        :param now: POSIX timestamp, defaults to now
+        :return:
+        """
+        if now is None:
+            now = time.time()
+        return self.status == "Accepted" and now < self.expires
+
+
 class AuthorizationCache:
-    def __init__(self, is_cache_supported: bool = False):
+    """
+    Authorization info of the tags, kept in memory and stored in auth.json. The local authorization list sent by
+    the central system and the cache of the tags authorized online are kept apart. The local list takes precedence
+    and its tags are never evicted. The number of cached tags is bounded: when the cache is full, an expired tag
+    is evicted first, otherwise the least recently used one.
+    The tags are loaded once at boot and served from memory. Tag updates from authorization responses are
+    written back to auth.json at most once per flush interval, local lists are written before they are accepted.
+    """
+    ListUpdateSuccess = "Success"
+    ListUpdateFailed = "Failed"
+    flush_interval: int = 5
+    __flush_job_id: str = "flush_authorization_cache"
+
+    def __init__(self, is_cache_supported: bool = False, file_name: str = None, max_cached_tags: int = 1000,
+                 is_local_list_supported: bool = False):
+        """
+        :param is_cache_supported: Cache the tag info
+        :param file_name: Path of the tag file, auth.json next to this module by default
+        :param max_cached_tags: Max number of cached tags, the local list is bounded separately
+        :param is_local_list_supported: Accept local authorization lists from the central system
+        """
         self.__is_cache_supported: bool = is_cache_supported
+        self.__is_local_list_supported: bool = is_local_list_supported
         self.__version: int = 1
-        # structure of authorized tag : {"id": 123, "status":"Accepted", "expiry_date":""}
-        self.__cached_tags: list = list()
-        self.__max_cached_tags: int = 0
-        self.__file_name: str = f"{path}/auth.json"
+        # Tag ID -> CachedTag, from the least to the most recently used
+        self.__cached_tags: OrderedDict = OrderedDict()
+        # Tag ID -> CachedTag of the local authorization list
+        self.__local_tags: dict = dict()
+        self.__max_local_tags: int = 0
+        # Min-heap of (expiry timestamp, tag ID), entries of updated or removed tags are skipped when popped
+        self.__expiry_heap: list = []
+        self.__is_loaded: bool = False
+        self.__max_cached_tags: int = max(int(max_cached_tags), 0)
+        self.__file_name: str = file_name if is_full_string(file_name) else f"{path}/auth.json"
+        self.__write_lock: asyncio.Lock = None
+        self.__is_dirty: bool = False
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        # Called with the tag ID and the new tag info, None if removed, of every tag written to the cache
+        self.__tag_listener = None
 
     @property
     def cached_tags(self) -> list:
-        return self.__cached_tags
+        return [tag.to_dict() for tag in self.__cached_tags.values()]
+
+    @property
+    def local_tags(self) -> list:
+        return [tag.to_dict() for tag in self.__local_tags.values()]
+
+    @staticmethod
+    def set_flush_interval(flush_interval: int):
+        """
+        Set the minimum interval between two writes of the tag updates to auth.json.
+        :param flush_interval: Interval in seconds
+        :return:
+        """
+        if flush_interval >= 0:
+            AuthorizationCache.flush_interval = flush_interval
+
+    def set_tag_listener(self, listener):
+        """
+        Set a function called when the info of a tag changes, e.g. to forget a rejected authorization.
+        :param listener: Function with the tag ID and the new tag info, None if the tag was removed
+        :return:
+        """
+        self.__tag_listener = listener
+
+    def __notify_tag_updated(self, id_tag: str, tag_info: dict):
+        if self.__tag_listener is not None:
+            try:
+                self.__tag_listener(id_tag, tag_info)
+            except Exception as ex:
+                logger.error(f"Tag listener failed for tag {id_tag}", exc_info=ex)
+
+    def set_cache_supported(self, is_cache_supported: bool):
+        self.__is_cache_supported = is_cache_supported
+        if is_cache_supported:
+            # The capacity may have been lowered while the cache was disabled
+            self.__evict(0)
+
+    @property
+    def is_cache_supported(self) -> bool:
+        return self.__is_cache_supported
+
+    def set_local_list_supported(self, is_local_list_supported: bool):
+        """
+        Enable or disable the local authorization list, independently of the Authorization Cache.
+        :param is_local_list_supported: Accept local authorization lists
+        :return:
+        """
+        self.__is_local_list_supported = is_local_list_supported
+
+    @property
+    def is_local_list_supported(self) -> bool:
+        return self.__is_local_list_supported
 
     def set_max_cached_tags(self, max_cached_tags: int):
-        if self.__is_cache_supported and max_cached_tags >= 0:
-            self.__max_cached_tags = max_cached_tags
+        """
+        Set the max number of cached tags. The capacity is kept while the cache is disabled
+        and applied when it is enabled.
+        :param max_cached_tags: Max number of tags
+        :return:
+        """
+        if max_cached_tags >= 0:
+            self.__max_cached_tags = int(max_cached_tags)
+            if self.__is_cache_supported:
+                self.__evict(0)
+
+    @property
+    def get_max_cached_tags(self) -> int:
+        return self.__max_cached_tags
+
+    def set_max_local_tags(self, max_local_tags: int):
+        """
+        Set the max number of tags in the local authorization list. A longer list is rejected,
+        the tags of the current list are kept.
+        :param max_local_tags: Max number of tags
+        :return:
+        """
+        if max_local_tags >= 0:
+            self.__max_local_tags = int(max_local_tags)
+
+    @property
+    def get_max_local_tags(self) -> int:
+        return self.__max_local_tags
+
+    @property
+    def get_statistics(self) -> dict:
+        lookups: int = self.hits + self.misses
+        return {"size": len(self.__cached_tags),
+                "capacity": self.__max_cached_tags,
+                "local_list_size": len(self.__local_tags),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups > 0 else 0.0}
 
     @property
     def get_version(self) -> int:
-        if not self.__is_cache_supported:
+        if not self.__is_local_list_supported:
             return -1
-        if len(self.__cached_tags) == 0:
+        if len(self.__local_tags) == 0:
             return 0
         return self.__version
 
     async def is_tag_authorized(self, id_tag: str) -> bool:
         """
-        Check if tag is in Authorization Cache.
+        Check if tag is in the local authorization list or the Authorization Cache, accepted and not expired.
+        The local list takes precedence.
         :param id_tag: Tag ID
         :return: True if it is present, false if not
         """
-        return next((tag["status"] == "Accepted" for tag in self.__cached_tags if tag["id"] == id_tag), False)
+        now: float = time.time()
+        tag: CachedTag = self.__local_tags.get(id_tag)
+        if tag is not None:
+            self.hits += 1
+            return tag.is_accepted(now)
+        tag = self.__cached_tags.get(id_tag)
+        if tag is None or tag.expires <= now:
+            self.misses += 1
+            return False
+        self.hits += 1
+        self.__cached_tags.move_to_end(id_tag)
+        return tag.is_accepted(now)
+
+    def is_tag_known(self, id_tag: str) -> bool:
+        """
+        Check if the tag is in the local list or cached, with any status.
+        :param id_tag: Tag ID
+        :return: True if the tag is known
+        """
+        return id_tag in self.__local_tags or id_tag in self.__cached_tags
+
+    def __set_tags(self, tags: OrderedDict):
+        self.__cached_tags = tags
+        self.__expiry_heap = [(tag.expires, id_tag) for id_tag, tag in tags.items() if tag.expires != math.inf]
+        heapq.heapify(self.__expiry_heap)
+
+    def __put_tag(self, tag: CachedTag):
+        self.__cached_tags[tag.id] = tag
+        self.__cached_tags.move_to_end(tag.id)
+        if tag.expires != math.inf:
+            heapq.heappush(self.__expiry_heap, (tag.expires, tag.id))
+            # Drop the stale entries when updates made the heap much larger than the cache
+            if len(self.__expiry_heap) > 2 * len(self.__cached_tags) + 16:
+                self.__set_tags(self.__cached_tags)
+
+    def get_expiring_tags(self, after: float, before: float, limit: int) -> list:
+        """
+        Get the accepted tags expiring between two timestamps, the earliest first. The expiry heap is walked
+        in order without popping, so the cost depends on the number of tags returned, not on the cache size.
+        :param after: POSIX timestamp, tags that expired earlier are skipped
+        :param before: POSIX timestamp
+        :param limit: Max number of tags
+        :return: List of tag IDs
+        """
+        heap: list = self.__expiry_heap
+        tags: list = []
+        # Heap of (expiry timestamp, tag ID, index in the expiry heap) of the nodes to visit
+        frontier: list = [(heap[0][0], heap[0][1], 0)] if len(heap) > 0 else []
+        while len(frontier) > 0 and len(tags) < limit:
+            expires, id_tag, index = heapq.heappop(frontier)
+            if expires > before:
+                break
+            tag: CachedTag = self.__cached_tags.get(id_tag)
+            if expires >= after and tag is not None and tag.expires == expires and tag.status == "Accepted" \
+                    and id_tag not in tags:
+                tags.append(id_tag)
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child][0], heap[child][1], child))
+        return tags
+
+    def __pop_expired(self, now: float) -> bool:
+        """
+        Remove the tag that expired the earliest.
+        :param now: POSIX timestamp
+        :return: True if an expired tag was removed
+        """
+        while len(self.__expiry_heap) > 0 and self.__expiry_heap[0][0] <= now:
+            expires, id_tag = heapq.heappop(self.__expiry_heap)
+            tag: CachedTag = self.__cached_tags.get(id_tag)
+            if tag is not None and tag.expires == expires:
+                del self.__cached_tags[id_tag]
+                return True
+        return False
+
+    def __evict(self, free_slots: int = 1):
+        """
+        Evict tags until there is room for free_slots new tags, expired tags first, then the least recently used.
+        :param free_slots: Number of tags to make room for
+        :return:
+        """
+        now: float = time.time()
+        while len(self.__cached_tags) > 0 and len(self.__cached_tags) + free_slots > self.__max_cached_tags:
+            if not self.__pop_expired(now):
+                self.__cached_tags.popitem(last=False)
+            self.evictions += 1
 
     async def update_version(self, version: int):
         """
@@ -48,107 +317,238 @@ class AuthorizationCache:
         :param version: Version number
         :return:
         """
-        async with open(self.__file_name, mode="r") as auth_file:
-            tag_data = json.loads(await auth_file.read())
-            await auth_file.close()
-            async with open(self.__file_name, mode="w") as auth:
-                tag_data["version"] = version
-                await auth.write(json.dumps(tag_data, indent=2, sort_keys=True))
-                await auth.close()
-                self.__version = version
+        await self.__ensure_loaded()
+        async with self.__get_write_lock():
+            await self.__write_to_auth_file(self.__local_tags, self.__cached_tags, version)
+            self.__version = version
 
-    async def update_cached_tags(self, tag_list: list):
+    async def update_cached_tags(self, tag_list: list, list_version: int = None, is_full_update: bool = False) -> str:
         """
-        Update the list with new authentication tags.
-        :param tag_list:
-        :return:
+        Apply a local authorization list in memory and write the result with a single write.
+        A full update replaces the local list, a differential update adds or updates the tags with tag info
+        and removes the tags without it. The version is changed only when the write succeeded.
+        The tags of the list are removed from the Authorization Cache. The list is applied while holding the write
+        lock, so a differential update always starts from the last applied list.
+        :param tag_list: List of OCPP AuthorizationData dictionaries
+        :param list_version: Version of the list, None keeps the current version
+        :param is_full_update: Replace the local list instead of updating it
+        :return: ListUpdateSuccess or ListUpdateFailed
         """
-        if not self.__is_cache_supported:
-            return
-        tasks = []
-        for tag in tag_list:
-            tasks.append(self.update_tag_info(tag["id"], tag["id_tag_info"]))
-        await asyncio.gather(*tasks)
+        if not self.__is_local_list_supported:
+            return AuthorizationCache.ListUpdateFailed
+        await self.__ensure_loaded()
+        async with self.__get_write_lock():
+            tags: dict = dict() if is_full_update else dict(self.__local_tags)
+            try:
+                for entry in tag_list:
+                    id_tag, tag_info = AuthorizationCache.__get_list_entry(entry)
+                    if not is_full_string(id_tag):
+                        return AuthorizationCache.ListUpdateFailed
+                    if tag_info is None or not is_full_string(tag_info.get("status")):
+                        tags.pop(id_tag, None)
+                        continue
+                    tags[id_tag] = CachedTag(id_tag, tag_info["status"], tag_info.get("expiry_date"))
+            except (KeyError, TypeError, AttributeError) as ex:
+                logger.debug("Invalid local authorization list", exc_info=ex)
+                return AuthorizationCache.ListUpdateFailed
+            if len(tags) > self.__max_local_tags:
+                logger.error(f"Local authorization list has {len(tags)} tags, max is {self.__max_local_tags}")
+                return AuthorizationCache.ListUpdateFailed
+            version: int = self.__version if list_version is None else list_version
+            cached_tags: OrderedDict = OrderedDict((id_tag, tag) for id_tag, tag in self.__cached_tags.items()
+                                                   if id_tag not in tags)
+            try:
+                await self.__write_to_auth_file(tags, cached_tags, version)
+            except Exception as ex:
+                logger.error("Failed writing the local authorization list", exc_info=ex)
+                print(ex)
+                return AuthorizationCache.ListUpdateFailed
+            previous_tags: dict = self.__local_tags
+            self.__local_tags = tags
+            for id_tag in tags:
+                self.__cached_tags.pop(id_tag, None)
+            self.__version = version
+            for id_tag, tag in tags.items():
+                self.__notify_tag_updated(id_tag, tag.to_dict())
+            for id_tag in previous_tags.keys() - tags.keys():
+                self.__notify_tag_updated(id_tag, None)
+            return AuthorizationCache.ListUpdateSuccess
+
+    @staticmethod
+    def __get_list_entry(entry: dict) -> (str, dict):
+        """
+        Get the tag ID and the tag info of an OCPP 1.6 or OCPP 2.0.1 AuthorizationData entry.
+        :param entry: AuthorizationData dictionary
+        :return: Tag ID and tag info, None if the tag info is missing
+        """
+        if "id_token" in entry:
+            return entry["id_token"]["id_token"], entry.get("id_token_info")
+        return entry.get("id_tag", entry.get("id")), entry.get("id_tag_info")
 
     async def update_tag_info(self, id_tag: str, tag_info: dict) -> str:
         """
-        Update a specific tag information regarding authorization.
+        Update a specific tag information regarding authorization in the Authorization Cache.
+        Tags of the local authorization list are only changed by the central system's local lists, so they are
+        not cached.
         :param id_tag: Tag ID
         :param tag_info: Tag status, expiry date and timestamp dictionary
         :return:
         """
-        if is_full_string(id_tag) and is_full_string(tag_info["status"]) and \
-                len(self.__cached_tags) < self.__max_cached_tags - 1 \
+        await self.__ensure_loaded()
+        if id_tag in self.__local_tags:
+            return "Success"
+        if is_full_string(id_tag) and is_full_string(tag_info["status"]) and self.__max_cached_tags > 0 \
                 and self.__is_cache_supported:
-            tag = {"id": id_tag,
-                   "status": tag_info["status"]}
-            if "expiry_date" in tag_info.keys():
-                tag["expiry_date"] = tag_info["expiry_date"]
-            await self.__write_to_auth_file(tag)
-            # Reload from file
-            await self.__load_tags_from_file()
+            if id_tag not in self.__cached_tags:
+                self.__evict()
+            tag: CachedTag = CachedTag(id_tag, tag_info["status"], tag_info.get("expiry_date"))
+            self.__put_tag(tag)
+            self.__mark_dirty()
+            self.__notify_tag_updated(id_tag, tag.to_dict())
             return "Success"
         return "Failed"
 
-    async def __write_to_auth_file(self, tag_info: dict):
+    def __mark_dirty(self):
+        """
+        Mark the in-memory tags as changed and schedule a flush, unless one is already pending.
+        :return:
+        """
+        self.__is_dirty = True
+        scheduler: AsyncIOScheduler = SchedulerManager.getScheduler()
+        if scheduler.get_job(AuthorizationCache.__flush_job_id) is None:
+            scheduler.add_job(self.flush, 'date',
+                              run_date=(datetime.now() + timedelta(seconds=AuthorizationCache.flush_interval)),
+                              id=AuthorizationCache.__flush_job_id)
+
+    async def flush(self):
         """
-        Update auth.json file for caching tag information.
-        :param tag_info:
+        Write the in-memory tags to auth.json if they changed since the last write.
         :return:
         """
-        async with open(self.__file_name, mode="r") as auth_file:
-            # Read the cache
-            tag_data = json.loads(await auth_file.read())
-            tag_copy = tag_data
-            await auth_file.close()
+        async with self.__get_write_lock():
+            if not self.__is_dirty:
+                return
+            self.__is_dirty = False
             try:
-                async with open(self.__file_name, mode="w") as auth:
-                    tag_list: list = tag_data["authorized_tags"]
-                    exists_in_cache: bool = False
-                    # Find tag info, if exists overwrite current status
-                    for index, tag in enumerate(tag_list):
-                        if tag["id"] == tag_info["id"]:
-                            tag_list[index] = tag_info
-                            exists_in_cache = True
-                    if not exists_in_cache:
-                        tag_list.append(tag_info)
-                    await auth.write(json.dumps(tag_data, indent=2, sort_keys=True))
-                    await auth.close()
+                await self.__write_to_auth_file(self.__local_tags, self.__cached_tags, self.__version)
             except Exception as ex:
-                logger.debug("Failed overwriting tag info", exc_info=ex)
+                self.__is_dirty = True
+                logger.error("Failed writing the authorization cache", exc_info=ex)
                 print(ex)
-                # If overwriting fails, restore old information
-                async with open(self.__file_name, mode="w") as backup:
-                    await backup.write(json.dumps(tag_copy, indent=2, sort_keys=True))
-                    await backup.close()
 
-    async def __load_tags_from_file(self):
+    def flush_sync(self):
+        """
+        Blocking variant of flush for the cleanup and reset paths, where the scheduler might not be running anymore.
+        :return:
+        """
+        if not self.__is_dirty:
+            return
+        temp_file_name: str = f"{self.__file_name}.tmp"
+        with builtins.open(temp_file_name, "w") as auth:
+            auth.write(self.__to_json([tag.to_dict() for tag in self.__local_tags.values()],
+                                      [tag.to_dict() for tag in self.__cached_tags.values()], self.__version))
+            auth.flush()
+            os.fsync(auth.fileno())
+        os.replace(temp_file_name, self.__file_name)
+        self.__is_dirty = False
+
+    @staticmethod
+    def __to_json(local_tags: list, cached_tags: list, version: int) -> str:
+        return json.dumps({"version": version, "local_list": local_tags, "authorized_tags": cached_tags},
+                          indent=2, sort_keys=True)
+
+    async def __write_to_auth_file(self, local_tags: dict, cached_tags: dict, version: int):
         """
-        Load cached tag info from a file. If no file is present, create new auth.json file.
-        :return: List version and tags
+        Write the tags to auth.json. The tags are written to a temporary file first, so a failed write
+        or a power loss leaves the previous auth.json intact. The caller must hold the write lock, so the tags are
+        taken and written in the order of the writes and an older state never replaces a newer one.
+        :param local_tags: Tag ID -> CachedTag of the local list
+        :param cached_tags: Tag ID -> CachedTag of the Authorization Cache
+        :param version: Version of the local list
+        :return:
+        """
+        # Serializing a large list takes a while, keep the event loop responsive
+        content: str = await asyncio.get_event_loop().run_in_executor(
+            None, AuthorizationCache.__to_json, [tag.to_dict() for tag in local_tags.values()],
+            [tag.to_dict() for tag in cached_tags.values()], version)
+        temp_file_name: str = f"{self.__file_name}.tmp"
+        async with open(temp_file_name, mode="w") as auth:
+            await auth.write(content)
+            await auth.flush()
+            os.fsync(auth.fileno())
+            await auth.close()
+        os.replace(temp_file_name, self.__file_name)
+
+    def __get_write_lock(self) -> asyncio.Lock:
+        # Created on first use in the running event loop
+        if self.__write_lock is None:
+            self.__write_lock = asyncio.Lock()
+        return self.__write_lock
+
+    async def __ensure_loaded(self):
+        if not self.__is_loaded:
+            await self.load()
+
+    async def load(self):
+        """
+        Load and validate the tags from auth.json into memory, e.g. at boot before the tags are read.
+        Invalid entries are skipped. If no file is present, auth.json is created at the first write.
+        :return:
         """
         try:
             async with open(self.__file_name, "r") as auth_file:
-                auth_data = json.loads(await auth_file.read())
+                content: str = await auth_file.read()
                 await auth_file.close()
-                self.__cached_tags = auth_data["authorized_tags"]
-                self.__version = auth_data["version"]
+            # Parsing a large list takes a while, keep the event loop responsive
+            version, local_tags, tags = await asyncio.get_event_loop().run_in_executor(
+                None, AuthorizationCache.__parse_auth_data, content)
+            self.__local_tags = local_tags
+            self.__set_tags(tags)
+            self.__version = version
+            self.__evict(0)
+            logger.info(f"Loaded {len(local_tags)} local list tags and {len(self.__cached_tags)} cached tags")
+        except FileNotFoundError:
+            logger.info("No authorization cache file found")
         except Exception as ex:
             print(ex)
-            logger.debug("Failed loading tags from auth cache", exc_info=ex)
-            # await self.clear_cache()
+            logger.error("Failed loading tags from auth cache", exc_info=ex)
+        self.__is_loaded = True
+
+    @staticmethod
+    def __parse_auth_data(content: str) -> (int, dict, OrderedDict):
+        """
+        Parse and validate the contents of auth.json.
+        :param content: JSON string
+        :return: List version, the tags of the local list and the cached tags
+        """
+        auth_data: dict = json.loads(content)
+        local_tags: dict = AuthorizationCache.__parse_tags(auth_data.get("local_list", []), dict())
+        tags: OrderedDict = AuthorizationCache.__parse_tags(auth_data.get("authorized_tags", []), OrderedDict())
+        for id_tag in local_tags:
+            tags.pop(id_tag, None)
+        return int(auth_data.get("version", 1)), local_tags, tags
+
+    @staticmethod
+    def __parse_tags(tag_list: list, tags: dict) -> dict:
+        for tag in tag_list:
+            if not isinstance(tag, dict) or not is_full_string(tag.get("id")) \
+                    or not is_full_string(tag.get("status")):
+                logger.warning(f"Skipping invalid cached tag {tag}")
+                continue
+            tags[tag["id"]] = CachedTag.from_dict(tag)
+        return tags
 
     async def clear_cache(self) -> str:
         """
-        Clear the auth file.
+        Clear the Authorization Cache, the local authorization list is kept.
         :return:
         """
         try:
-            async with open(self.__file_name, "w+") as auth_file:
-                auth_data = dict()
-                auth_data["version"] = self.__version
-                auth_data["authorized_tags"] = list()
-                await auth_file.write(json.dumps(auth_data, indent=2, sort_keys=True))
+            await self.__ensure_loaded()
+            async with self.__get_write_lock():
+                await self.__write_to_auth_file(self.__local_tags, dict(), self.__version)
+                self.__set_tags(OrderedDict())
+                self.__is_dirty = False
             return "Success"
         except Exception as ex:
             logger.debug("Failed clearing the auth cache", exc_info=ex)
@@ -0,0 +1,96 @@
+import asyncio
+import contextlib
+import logging
+import time
+from charge_point.data.auth.authorization_cache import AuthorizationCache
+
+logger = logging.getLogger('chargepi_logger')
+
+
+class TagRevalidator:
+    """
+    Re-authorizes the cached tags before they expire, so regular users are authorized from the cache.
+    Tags are refreshed in the order of their expiry, a few at a time and only when the charge point is idle:
+    while a transaction is starting and for idle_time seconds after, the refresh waits.
+    """
+
+    def __init__(self, authorization_cache: AuthorizationCache, authorize_function,
+                 refresh_window: float = 900, max_per_run: int = 5, min_interval: float = 2,
+                 idle_time: float = 30, retry_interval: float = 300, clock=time.monotonic):
+        """
+        :param authorization_cache: Authorization cache with the tags
+        :param authorize_function: Coroutine function authorizing a tag with the central system
+        :param refresh_window: Tags expiring within this many seconds are refreshed
+        :param max_per_run: Max number of tags refreshed per run
+        :param min_interval: Min time in seconds between two requests
+        :param idle_time: Time in seconds without a transaction start before refreshing
+        :param retry_interval: Time in seconds before a tag is refreshed again
+        :param clock: Monotonic clock in seconds
+        """
+        self._authorization_cache: AuthorizationCache = authorization_cache
+        self._authorize_function = authorize_function
+        self.refresh_window: float = refresh_window
+        self.max_per_run: int = max_per_run
+        self.min_interval: float = min_interval
+        self.idle_time: float = idle_time
+        self.retry_interval: float = retry_interval
+        self._clock = clock
+        self._starting_transactions: int = 0
+        self._last_activity: float = None
+        # Tag ID -> monotonic time of the last refresh
+        self._refreshed: dict = {}
+        self.refreshes: int = 0
+
+    @contextlib.contextmanager
+    def paused(self):
+        """
+        Pause the refresh while a transaction is starting.
+        :return:
+        """
+        self._starting_transactions += 1
+        try:
+            yield
+        finally:
+            self._starting_transactions -= 1
+            self._last_activity = self._clock()
+
+    @property
+    def is_idle(self) -> bool:
+        return self._starting_transactions == 0 and \
+               (self._last_activity is None or self._clock() - self._last_activity >= self.idle_time)
+
+    def get_candidates(self) -> list:
+        """
+        Get the tags to refresh, the earliest expiring first.
+        :return: List of tag IDs
+        """
+        now: float = time.time()
+        monotonic_now: float = self._clock()
+        for id_tag, refreshed in list(self._refreshed.items()):
+            if monotonic_now - refreshed >= self.retry_interval:
+                del self._refreshed[id_tag]
+        tags: list = self._authorization_cache.get_expiring_tags(now - self.refresh_window,
+                                                                 now + self.refresh_window,
+                                                                 self.max_per_run + len(self._refreshed))
+        return [id_tag for id_tag in tags if id_tag not in self._refreshed][:self.max_per_run]
+
+    async def run_once(self):
+        """
+        Refresh the tags nearing expiry if the charge point is idle.
+        :return:
+        """
+        if not self._authorization_cache.is_cache_supported:
+            return
+        for id_tag in self.get_candidates():
+            if not self.is_idle:
+                return
+            self._refreshed[id_tag] = self._clock()
+            try:
+                await self._authorize_function(id_tag)
+                self.refreshes += 1
+                logger.debug(f"Refreshed tag {id_tag}")
+            except Exception as ex:
+                # Most likely offline, try again at the next run
+                logger.debug(f"Refreshing tag {id_tag} failed", exc_info=ex)
+                return
+            await asyncio.sleep(self.min_interval)
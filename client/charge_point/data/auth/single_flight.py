@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger('chargepi_logger')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key, e.g. Authorize requests for the same tag: the first call runs
+    and the later ones wait for its result instead of starting their own. Negative results are remembered for
+    negative_ttl seconds, so repeated calls with a rejected key are answered without running the call again.
+    """
+
+    def __init__(self, is_negative=None, negative_ttl: float = 10, clock=time.monotonic):
+        """
+        :param is_negative: Function returning True if a result should be remembered, None remembers nothing
+        :param negative_ttl: Time in seconds a negative result is remembered
+        :param clock: Monotonic clock in seconds
+        """
+        self.is_negative = is_negative
+        self.negative_ttl: float = negative_ttl
+        self._clock = clock
+        # Key -> future of the running call
+        self._in_flight: dict = {}
+        # Key -> (expiry time, result)
+        self._negative_results: dict = {}
+        self.calls: int = 0
+        self.coalesced: int = 0
+        self.negative_hits: int = 0
+
+    async def run(self, key, function, *args):
+        """
+        Run the coroutine function or join the running call with the same key.
+        :param key: Key of the call, e.g. the tag ID
+        :param function: Coroutine function
+        :param args: Arguments of the function
+        :return: Result of the function
+        """
+        now: float = self._clock()
+        negative_result = self._negative_results.get(key)
+        if negative_result is not None:
+            if now < negative_result[0]:
+                self.negative_hits += 1
+                return negative_result[1]
+            del self._negative_results[key]
+        future: asyncio.Future = self._in_flight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(function(*args))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self.__on_done(key, done))
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the call the others are waiting for
+        return await asyncio.shield(future)
+
+    def __on_done(self, key, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        if self.is_negative is not None and self.is_negative(future.result()):
+            self._negative_results[key] = (self._clock() + self.negative_ttl, future.result())
+            # Drop the expired results, so unknown tags don't accumulate
+            now: float = self._clock()
+            for negative_key, (expires, _) in list(self._negative_results.items()):
+                if expires <= now:
+                    del self._negative_results[negative_key]
+
+    def forget(self, key):
+        """
+        Forget the negative result of a key, e.g. when the tag was added to the local list.
+        :param key: Key of the call
+        :return:
+        """
+        self._negative_results.pop(key, None)
+
+    def is_in_flight(self, key) -> bool:
+        return key in self._in_flight
@@ -0,0 +1,49 @@
+import time
+
+
+class EnergyRegister:
+    """
+    Energy.Active.Import.Register of a connector in Wh. The register only increases and is fed either by the
+    energy measured by the power meter or by trapezoidal integration of the power samples.
+    """
+
+    def __init__(self, energy: float = 0.0):
+        self._energy: float = max(energy, 0.0)
+        self._last_power: float = None
+        self._last_sample_time: float = None
+
+    def add_energy(self, energy: float):
+        """
+        Add energy measured by the power meter.
+        :param energy: Energy in Joules (Ws)
+        :return:
+        """
+        if energy > 0:
+            self._energy += energy / 3600
+
+    def add_power_sample(self, power: float, sample_time: float = None):
+        """
+        Integrate the power between the previous and this sample.
+        :param power: Power in Watts
+        :param sample_time: Monotonic time of the sample in seconds, defaults to now
+        :return:
+        """
+        if sample_time is None:
+            sample_time = time.monotonic()
+        if self._last_sample_time is not None and sample_time > self._last_sample_time:
+            energy: float = (self._last_power + power) / 2 * (sample_time - self._last_sample_time)
+            self.add_energy(energy)
+        self._last_power = power
+        self._last_sample_time = sample_time
+
+    def reset_integration(self):
+        """
+        Start a new integration interval, so the time between two sessions is not integrated.
+        :return:
+        """
+        self._last_power = None
+        self._last_sample_time = None
+
+    @property
+    def value(self) -> float:
+        return self._energy
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import os
+import struct
+from aiofiles import open as a_open
+
+_path = os.path.dirname(os.path.realpath(__file__))
+logger = logging.getLogger('chargepi_logger')
+
+
+class MeterJournal:
+    """
+    An append-only journal of meter samples for a single charging session.
+    Each record is a (timestamp, value, measurand code) sample prefixed with its length, so only the new samples are
+    written to non-volatile memory. A record cut short by a power loss is ignored when the journal is replayed.
+    Appends are written one at a time, the journal is closed when it is compacted.
+    """
+
+    directory: str = f"{_path}/journal"
+    __record_header: struct.Struct = struct.Struct("<I")
+    __sample: struct.Struct = struct.Struct("<ddB")
+
+    def __init__(self, evse_id: int, connector_id: int, transaction_id: str):
+        self.file_name: str = f"{MeterJournal.directory}/{evse_id}_{connector_id}_{transaction_id}.journal"
+        self.__append_lock: asyncio.Lock = None
+        self.__is_closed: bool = False
+
+    async def append(self, samples: list):
+        """
+        Append meter samples to the journal.
+        :param samples: List of (timestamp, value, measurand code) samples
+        :return:
+        """
+        if len(samples) == 0 or self.__is_closed:
+            return
+        records: bytearray = bytearray()
+        for sample in samples:
+            record: bytes = MeterJournal.__sample.pack(*sample)
+            records += MeterJournal.__record_header.pack(len(record))
+            records += record
+        if self.__append_lock is None:
+            self.__append_lock = asyncio.Lock()
+        async with self.__append_lock:
+            if self.__is_closed:
+                return
+            os.makedirs(MeterJournal.directory, exist_ok=True)
+            async with a_open(self.file_name, "ab") as journal_file:
+                await journal_file.write(bytes(records))
+                await journal_file.flush()
+                os.fsync(journal_file.fileno())
+                await journal_file.close()
+            if self.__is_closed:
+                # The session ended during the write, which recreated the removed journal
+                self.__remove()
+
+    def replay(self) -> list:
+        """
+        Read all the meter samples from the journal.
+        :return: List of (timestamp, value, measurand code) samples
+        """
+        samples: list = []
+        try:
+            with open(self.file_name, "rb") as journal_file:
+                content: bytes = journal_file.read()
+                journal_file.close()
+        except FileNotFoundError:
+            return samples
+        header_size: int = MeterJournal.__record_header.size
+        offset: int = 0
+        while offset + header_size <= len(content):
+            record_length, = MeterJournal.__record_header.unpack_from(content, offset)
+            offset += header_size
+            if offset + record_length > len(content):
+                # Incomplete record, the write was interrupted
+                break
+            try:
+                samples.append(MeterJournal.__sample.unpack(content[offset:offset + record_length]))
+            except struct.error as ex:
+                logger.debug("Skipping a corrupted meter journal record", exc_info=ex)
+            offset += record_length
+        return samples
+
+    def compact(self):
+        """
+        Compact the journal when the session ends. The samples were already reported to the central system,
+        so the journal is removed and further appends are ignored.
+        :return:
+        """
+        self.__is_closed = True
+        self.__remove()
+
+    def __remove(self):
+        try:
+            os.remove(self.file_name)
+        except FileNotFoundError:
+            pass
+        except Exception as ex:
+            logger.debug("Failed removing the meter journal", exc_info=ex)
@@ -0,0 +1,101 @@
+import time
+from array import array
+from datetime import datetime
+
+_epoch: datetime = datetime(1970, 1, 1)
+
+
+class MeterSampleBuffer:
+    """
+    Columnar storage of meter samples. Timestamps (UTC epoch seconds), values and measurand codes are kept in
+    typed arrays, so a sample takes 17 bytes instead of a dictionary, a list and a timestamp string.
+    OCPP MeterValue dictionaries are only created when they are requested.
+    """
+
+    # Measurand code is the index in the list, 0 means the measurand is not specified
+    measurands: list = ["",
+                        "Power.Active.Import",
+                        "Energy.Active.Import.Register",
+                        "Current.Import",
+                        "Voltage"]
+
+    def __init__(self):
+        self._timestamps: array = array('d')
+        self._values: array = array('d')
+        self._measurands: array = array('B')
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def append(self, value: float, measurand: str = "", timestamp: float = None):
+        """
+        Add a sample to the buffer.
+        :param value: Sampled value
+        :param measurand: Measurand of the value
+        :param timestamp: UTC epoch timestamp, defaults to now
+        :return:
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self._timestamps.append(timestamp)
+        self._values.append(value)
+        self._measurands.append(MeterSampleBuffer.get_measurand_code(measurand))
+
+    def extend(self, records: list):
+        """
+        Add samples as (timestamp, value, measurand code) records.
+        :param records: List of records
+        :return:
+        """
+        for timestamp, value, measurand_code in records:
+            self._timestamps.append(timestamp)
+            self._values.append(value)
+            self._measurands.append(measurand_code)
+
+    def extend_from_meter_values(self, meter_values: list):
+        """
+        Add samples from OCPP MeterValue dictionaries, e.g. when restoring a session.
+        :param meter_values: List of MeterValue dictionaries
+        :return:
+        """
+        for meter_value in meter_values:
+            timestamp: float = (datetime.fromisoformat(meter_value["timestamp"]) - _epoch).total_seconds()
+            for sampled_value in meter_value["sampled_value"]:
+                self.append(float(sampled_value["value"]), sampled_value.get("measurand", ""), timestamp)
+
+    def get_records(self, start: int = 0) -> list:
+        """
+        Get the samples from the start index as (timestamp, value, measurand code) records.
+        :param start: Index of the first sample
+        :return: List of records
+        """
+        return list(zip(self._timestamps[start:], self._values[start:], self._measurands[start:]))
+
+    def to_meter_values(self, start: int = 0) -> list:
+        """
+        Render the samples from the start index as OCPP MeterValue dictionaries.
+        :param start: Index of the first sample
+        :return: List of MeterValue dictionaries
+        """
+        return [MeterSampleBuffer.render(timestamp, value, measurand_code)
+                for timestamp, value, measurand_code in self.get_records(start)]
+
+    def last(self) -> dict:
+        if len(self) == 0:
+            return None
+        return MeterSampleBuffer.render(self._timestamps[-1], self._values[-1], self._measurands[-1])
+
+    @staticmethod
+    def render(timestamp: float, value: float, measurand_code: int) -> dict:
+        sampled_value: dict = {"value": f"{value}"}
+        if measurand_code != 0:
+            sampled_value["measurand"] = MeterSampleBuffer.measurands[measurand_code]
+        return {"timestamp": datetime.utcfromtimestamp(timestamp).isoformat(),
+                "sampled_value": [sampled_value]}
+
+    @staticmethod
+    def get_measurand_code(measurand: str) -> int:
+        try:
+            return MeterSampleBuffer.measurands.index(measurand)
+        except ValueError:
+            return 0
@@ -0,0 +1,84 @@
+import math
+from collections import deque
+
+
+class RunningStatistics:
+    """
+    Streaming statistics of a series of samples. Mean and variance are computed with Welford's algorithm,
+    the recent average with an exponentially weighted moving average (EWMA). Adding a sample takes constant time
+    and memory.
+    """
+
+    def __init__(self, ewma_alpha: float = 2 / (30 + 1)):
+        self._ewma_alpha: float = ewma_alpha
+        self._count: int = 0
+        self._mean: float = 0.0
+        self._m2: float = 0.0
+        self._min: float = math.inf
+        self._max: float = -math.inf
+        self._ewma: float = 0.0
+
+    def add(self, value: float):
+        self._count += 1
+        delta: float = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+        if self._count == 1:
+            self._ewma = value
+        else:
+            self._ewma += self._ewma_alpha * (value - self._ewma)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        if self._count < 2:
+            return 0.0
+        return self._m2 / (self._count - 1)
+
+    @property
+    def min(self) -> float:
+        return self._min if self._count > 0 else 0.0
+
+    @property
+    def max(self) -> float:
+        return self._max if self._count > 0 else 0.0
+
+    @property
+    def ewma(self) -> float:
+        return self._ewma
+
+
+class SlidingWindowMax:
+    """
+    Maximum of the last window_size samples. Keeps a monotonically decreasing deque of candidates,
+    so adding a sample and reading the maximum take amortized constant time.
+    """
+
+    def __init__(self, window_size: int):
+        self._window_size: int = max(window_size, 1)
+        self._index: int = 0
+        # Entries are (sample index, value) with decreasing values
+        self._candidates: deque = deque()
+
+    def add(self, value: float):
+        while len(self._candidates) > 0 and self._candidates[-1][1] <= value:
+            self._candidates.pop()
+        self._candidates.append((self._index, value))
+        while self._candidates[0][0] <= self._index - self._window_size:
+            self._candidates.popleft()
+        self._index += 1
+
+    @property
+    def max(self) -> float:
+        if len(self._candidates) == 0:
+            return 0.0
+        return self._candidates[0][1]
@@ -1,6 +1,7 @@
 from datetime import datetime
-from statistics import mean
 from string_utils import is_full_string
+from charge_point.data.meter_samples import MeterSampleBuffer
+from charge_point.data.running_statistics import RunningStatistics, SlidingWindowMax
 
 
 class ChargingSession:
@@ -26,26 +27,25 @@ class ChargingSession:
         self._transaction_id: str = ""
         self._tag_id: str = ""
         self._is_active: bool = False
-        # Structure of entries in the list must be:
-        # "timestamp": <time>, "sampledValue": [{ "value": <value>, "measurand": <meas>}]
         self._started: str = ""
-        self._meter_samples: list = list()
-        self._power: list = list()
-        self._avg_power: float = 0.0
+        self._meter_samples: MeterSampleBuffer = MeterSampleBuffer()
+        self._power_statistics: RunningStatistics = RunningStatistics()
+        self._power_window: SlidingWindowMax = SlidingWindowMax(60)
 
-    def start_charging_session(self, tag_id: str, transaction_id: str = "") -> str:
+    def start_charging_session(self, tag_id: str, transaction_id: str = "", sample_window: int = 60) -> str:
         """
         Start the charging session.
         :param transaction_id: Transaction ID
         :param tag_id: User or RFID tag ID
+        :param sample_window: Number of power samples to get the max sample value from
         :return:
         """
         if not self._is_active and is_full_string(tag_id) and is_full_string(transaction_id):
             self._transaction_id = transaction_id
             self._tag_id = tag_id
-            self._meter_samples = list()
-            self._avg_power: float = 0.0
-            self._power: list = [self._avg_power]
+            self._meter_samples = MeterSampleBuffer()
+            self._power_statistics = RunningStatistics()
+            self._power_window = SlidingWindowMax(sample_window)
             self._started: str = datetime.now().isoformat()
             self._is_active = True
             return ChargingSession.SessionStartSuccess
@@ -61,14 +61,15 @@ class ChargingSession:
         self._transaction_id = ""
         return ChargingSession.SessionStopSuccess
 
-    def resume_charging_session(self, tag_id: str, meter_samples: list, transaction_id: str = "",
-                                started: str = "") -> str:
+    def resume_charging_session(self, tag_id: str, meter_samples: MeterSampleBuffer, transaction_id: str = "",
+                                started: str = "", sample_window: int = 60) -> str:
         """
         Resume a charging session from previous state which is stored in non-volatile memory.
         :param tag_id: Tag ID
-        :param meter_samples: A list of meter samples
+        :param meter_samples: Meter samples of the session
         :param transaction_id: Transaction ID
         :param started: Date of the transaction start
+        :param sample_window: Number of power samples to get the max sample value from
         :return:
         """
         if not self._is_active and is_full_string(transaction_id) and is_full_string(tag_id):
@@ -76,49 +77,67 @@ class ChargingSession:
             self._tag_id = tag_id
             self._started = started
             self._meter_samples = meter_samples
+            self._power_statistics = RunningStatistics()
+            self._power_window = SlidingWindowMax(sample_window)
             self._is_active = True
             return ChargingSession.SessionResumeSuccess
         return ChargingSession.SessionResumeFailure
 
     def add_power_sample(self, power: float):
-        self._power.append(power)
-        self._avg_power = mean(self._power)
-        if len(self._power) > 30:
-            self._power = [self._avg_power]
+        self._power_statistics.add(power)
+        self._power_window.add(power)
 
-    def add_meter_sample(self, sample: float):
+    def add_meter_sample(self, sample: float, measurand: str = ""):
         """
-        Log energy consumption in a list while charging.
+        Log energy consumption in a buffer while charging.
         :param: sample:
+        :param: measurand:
         :return:
         """
-        self._meter_samples.append({"timestamp": datetime.utcnow().isoformat(),
-                                    "sampled_value": [
-                                        {
-                                            "value": f"{sample}"
-                                            # "measurand" : <measurand>
-                                        }]
-                                    })
+        self._meter_samples.append(sample, measurand)
 
     @property
     def get_meter_samples(self) -> list:
+        """
+        Meter samples rendered as OCPP MeterValue dictionaries.
+        """
+        return self._meter_samples.to_meter_values()
+
+    @property
+    def get_meter_sample_buffer(self) -> MeterSampleBuffer:
         return self._meter_samples
 
     @property
     def get_last_sample(self) -> float:
-        try:
-            return self._meter_samples[len(self._meter_samples) - 1]
-        except Exception as ex:
-            print(ex)
+        last_sample: dict = self._meter_samples.last()
+        if last_sample is None:
             return -1
+        return last_sample
 
     @property
     def get_max_sample_value(self) -> float:
-        return max(self._power)
+        """
+        Max power sample within the sample window.
+        """
+        return self._power_window.max
 
     @property
     def get_avg_power(self) -> float:
-        return self._avg_power
+        """
+        Average power of the whole session.
+        """
+        return self._power_statistics.mean
+
+    @property
+    def get_recent_avg_power(self) -> float:
+        """
+        Exponentially weighted average of the recent power samples.
+        """
+        return self._power_statistics.ewma
+
+    @property
+    def get_power_statistics(self) -> RunningStatistics:
+        return self._power_statistics
 
     @property
     def get_tag_id(self) -> str:
@@ -5,11 +5,12 @@ import os
 _path = os.path.dirname(os.path.realpath(__file__))
 
 
-async def read_settings() -> (dict, dict):
+async def read_settings() -> (dict, dict, dict):
     async with open("{path}/../../settings.json".format(path=_path), "r", buffering=True) as settings_file:
         config_data = await settings_file.read()
         data: dict = json.loads(config_data)
         charge_point_info: dict = data["charge_point"]["info"]
         hardware_info: dict = data["charge_point"]["hardware"]
+        storage_info: dict = data["charge_point"].get("storage", {})
         await settings_file.close()
-        return charge_point_info, hardware_info
+        return charge_point_info, hardware_info, storage_info
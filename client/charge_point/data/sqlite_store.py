@@ -0,0 +1,258 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from charge_point.data.meter_samples import MeterSampleBuffer
+
+logger = logging.getLogger('chargepi_logger')
+
+_schema: str = """
+CREATE TABLE IF NOT EXISTS connectors (
+    evse_id INTEGER NOT NULL,
+    connector_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    relay TEXT NOT NULL,
+    power_meter TEXT NOT NULL,
+    PRIMARY KEY (evse_id, connector_id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    evse_id INTEGER NOT NULL,
+    connector_id INTEGER NOT NULL,
+    transaction_id TEXT NOT NULL,
+    tag_id TEXT NOT NULL,
+    started TEXT NOT NULL,
+    is_active INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_transaction_id ON sessions (transaction_id);
+CREATE INDEX IF NOT EXISTS sessions_evse_connector ON sessions (evse_id, connector_id);
+CREATE TABLE IF NOT EXISTS meter_samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    evse_id INTEGER NOT NULL,
+    connector_id INTEGER NOT NULL,
+    transaction_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    value REAL NOT NULL,
+    measurand INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS meter_samples_session ON meter_samples (evse_id, connector_id, transaction_id);
+"""
+
+
+class SQLiteConnectorStore:
+    """
+    SQLite storage backend for connectors, their sessions and meter samples. The database runs in WAL mode.
+    Ended sessions stay in the database as history, their meter samples are removed when the session ends.
+    Lookups by transaction ID and by EVSE and connector ID are indexed.
+    """
+
+    def __init__(self, database_file: str):
+        self.database_file: str = database_file
+        self.__connection: sqlite3.Connection = sqlite3.connect(database_file, check_same_thread=False)
+        # The connectors are saved from an executor thread, transactions must not interleave
+        self.__lock: threading.Lock = threading.Lock()
+        self.__connection.row_factory = sqlite3.Row
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+        self.__connection.executescript(_schema)
+        self.__connection.commit()
+
+    def is_empty(self) -> bool:
+        return self.__connection.execute("SELECT COUNT(*) FROM connectors").fetchone()[0] == 0
+
+    def import_from_json(self, evses: list):
+        """
+        Import EVSEs and connectors with their sessions in the connectors.json structure.
+        :param evses: List of EVSEs from connectors.json
+        :return:
+        """
+        self.save_evses(evses)
+        for evse in evses:
+            for connector in evse["connectors"]:
+                session: dict = connector["session"]
+                if len(session.get("consumption", [])) > 0 and session["transaction_id"] != "":
+                    meter_samples: MeterSampleBuffer = MeterSampleBuffer()
+                    meter_samples.extend_from_meter_values(session["consumption"])
+                    self.append_meter_samples(evse["id"], connector["id"], session["transaction_id"],
+                                              meter_samples.get_records())
+
+    def load_evses(self) -> list:
+        """
+        Build the EVSE list in the connectors.json structure, with the active session of each connector.
+        :return: List of EVSEs
+        """
+        evses: dict = {}
+        for row in self.__connection.execute("SELECT * FROM connectors ORDER BY evse_id, connector_id"):
+            evse: dict = evses.setdefault(row["evse_id"], {"id": row["evse_id"], "connectors": []})
+            evse["connectors"].append({
+                "id": row["connector_id"],
+                "type": row["type"],
+                "status": row["status"],
+                "session": self.__get_active_session(row["evse_id"], row["connector_id"]),
+                "relay": json.loads(row["relay"]),
+                "power_meter": json.loads(row["power_meter"])
+            })
+        return list(evses.values())
+
+    def save_evses(self, evses: list):
+        """
+        Store the state of all connectors and their sessions in a single transaction.
+        :param evses: List of EVSEs in the connectors.json structure
+        :return:
+        """
+        with self.__lock, self.__connection:
+            for evse in evses:
+                for connector in evse["connectors"]:
+                    self.__connection.execute(
+                        "INSERT OR REPLACE INTO connectors (evse_id, connector_id, type, status, relay, power_meter) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (evse["id"], connector["id"], connector["type"], connector["status"],
+                         json.dumps(connector["relay"]), json.dumps(connector["power_meter"])))
+                    self.__save_session(evse["id"], connector["id"], connector["session"])
+
+    def __save_session(self, evse_id: int, connector_id: int, session: dict):
+        if session["transaction_id"] == "":
+            # The session was cleared, keep the previous sessions as history
+            self.__connection.execute("UPDATE sessions SET is_active = 0 "
+                                      "WHERE evse_id = ? AND connector_id = ? AND is_active = 1",
+                                      (evse_id, connector_id))
+            return
+        row = self.__connection.execute("SELECT id FROM sessions "
+                                        "WHERE transaction_id = ? AND evse_id = ? AND connector_id = ?",
+                                        (session["transaction_id"], evse_id, connector_id)).fetchone()
+        if row is None:
+            self.__connection.execute("UPDATE sessions SET is_active = 0 "
+                                      "WHERE evse_id = ? AND connector_id = ? AND is_active = 1",
+                                      (evse_id, connector_id))
+            self.__connection.execute(
+                "INSERT INTO sessions (evse_id, connector_id, transaction_id, tag_id, started, is_active) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (evse_id, connector_id, session["transaction_id"], session["tag_id"], session["started"],
+                 int(session["is_active"])))
+        else:
+            self.__connection.execute("UPDATE sessions SET tag_id = ?, started = ?, is_active = ? WHERE id = ?",
+                                      (session["tag_id"], session["started"], int(session["is_active"]),
+                                       row["id"]))
+
+    def __get_active_session(self, evse_id: int, connector_id: int) -> dict:
+        row = self.__connection.execute("SELECT * FROM sessions "
+                                        "WHERE evse_id = ? AND connector_id = ? AND is_active = 1 "
+                                        "ORDER BY id DESC LIMIT 1",
+                                        (evse_id, connector_id)).fetchone()
+        if row is None:
+            return {
+                "is_active": False,
+                "transaction_id": "",
+                "tag_id": "",
+                "started": "",
+                "consumption": []
+            }
+        return {
+            "is_active": bool(row["is_active"]),
+            "transaction_id": row["transaction_id"],
+            "tag_id": row["tag_id"],
+            "started": row["started"],
+            "consumption": []
+        }
+
+    def find_connector_with_transaction_id(self, transaction_id: str) -> (int, int):
+        """
+        Find the EVSE and connector of a session with the transaction ID.
+        :param transaction_id: Transaction ID
+        :return: EVSE ID and connector ID or None
+        """
+        row = self.__connection.execute("SELECT evse_id, connector_id FROM sessions WHERE transaction_id = ? "
+                                        "ORDER BY id DESC LIMIT 1",
+                                        (transaction_id,)).fetchone()
+        if row is None:
+            return None
+        return row["evse_id"], row["connector_id"]
+
+    def append_meter_samples(self, evse_id: int, connector_id: int, transaction_id: str, samples: list):
+        """
+        Store meter samples of a session.
+        :param samples: List of (timestamp, value, measurand code) samples
+        :return:
+        """
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                "INSERT INTO meter_samples (evse_id, connector_id, transaction_id, timestamp, value, measurand) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(evse_id, connector_id, transaction_id, timestamp, value, measurand)
+                 for timestamp, value, measurand in samples])
+
+    def delete_meter_samples(self, evse_id: int, connector_id: int, transaction_id: str):
+        """
+        Remove the meter samples of a session and checkpoint the WAL, so the freed pages are reused.
+        :return:
+        """
+        with self.__lock:
+            with self.__connection:
+                self.__connection.execute("DELETE FROM meter_samples "
+                                          "WHERE evse_id = ? AND connector_id = ? AND transaction_id = ?",
+                                          (evse_id, connector_id, transaction_id))
+            self.__connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def get_meter_samples(self, evse_id: int, connector_id: int, transaction_id: str) -> list:
+        return [(row["timestamp"], row["value"], row["measurand"]) for row in self.__connection.execute(
+            "SELECT timestamp, value, measurand FROM meter_samples "
+            "WHERE evse_id = ? AND connector_id = ? AND transaction_id = ? ORDER BY id",
+            (evse_id, connector_id, transaction_id))]
+
+    def close(self):
+        self.__connection.close()
+
+
+class SQLiteMeterJournal:
+    """
+    Meter journal for the SQLite backend. Samples are stored in the meter_samples table.
+    The database is written from an executor thread, so a commit does not block the event loop.
+    """
+
+    def __init__(self, store: SQLiteConnectorStore, evse_id: int, connector_id: int, transaction_id: str):
+        self.__store: SQLiteConnectorStore = store
+        self.__evse_id: int = evse_id
+        self.__connector_id: int = connector_id
+        self.__transaction_id: str = transaction_id
+        self.__append_lock: asyncio.Lock = None
+        self.__is_closed: bool = False
+
+    async def append(self, samples: list):
+        """
+        Append meter samples to the journal.
+        :param samples: List of (timestamp, value, measurand code) samples
+        :return:
+        """
+        if len(samples) == 0 or self.__is_closed:
+            return
+        if self.__append_lock is None:
+            self.__append_lock = asyncio.Lock()
+        async with self.__append_lock:
+            if self.__is_closed:
+                return
+            await asyncio.get_event_loop().run_in_executor(None, self.__store.append_meter_samples,
+                                                           self.__evse_id, self.__connector_id,
+                                                           self.__transaction_id, samples)
+            if self.__is_closed:
+                # The session ended during the write, remove the samples inserted after the compaction
+                await asyncio.get_event_loop().run_in_executor(None, self.__delete)
+
+    def replay(self) -> list:
+        return self.__store.get_meter_samples(self.__evse_id, self.__connector_id, self.__transaction_id)
+
+    def compact(self):
+        """
+        Compact the journal when the session ends. The samples were already reported to the central system,
+        so they are removed in the background and further appends are ignored.
+        :return:
+        """
+        self.__is_closed = True
+        asyncio.get_event_loop().run_in_executor(None, self.__delete)
+
+    def __delete(self):
+        try:
+            self.__store.delete_meter_samples(self.__evse_id, self.__connector_id, self.__transaction_id)
+        except Exception as ex:
+            logger.debug("Failed removing the meter samples", exc_info=ex)
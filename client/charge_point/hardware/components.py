@@ -1,6 +1,10 @@
 import asyncio
+import threading
 import time
+from collections import namedtuple
 import spidev
+from charge_point.hardware.display import LCDFrameBuffer, MessageQueue, DisplayMessage
+from charge_point.hardware.io_executor import HardwareExecutor
 import RPi.GPIO as GPIO
 from rpi_ws281x import Color
 from RPLCD.i2c import CharLCD as i2c_lcd
@@ -76,16 +80,43 @@ class LEDStrip:
     OFF: Color = Color(0, 0, 0)
 
 
+# Values measured in the last conversion cycle. Energy is in Joules, RMS values are computed over the cycle.
+MeterSnapshot = namedtuple("MeterSnapshot", ["current", "voltage", "power", "energy", "rms_current", "rms_voltage"])
+
+
+class PowerMeterFault(Exception):
+    """
+    Raised when the power meter chip does not set the expected status bits in time.
+    """
+
+    def __init__(self, pin: int, bus: int, status_mask: int, timeout: float):
+        super().__init__(f"Power meter at pin {pin} on SPI bus {bus} did not set status {hex(status_mask)} "
+                         f"within {timeout} s")
+        self.pin: int = pin
+        self.bus: int = bus
+        self.status_mask: int = status_mask
+
+
 class PowerMeter:
     """
     Class representing a CS5460 power meter chip. Reads values from the meter to log consumption on a connector.
     """
 
+    # Status polling backoff and timeouts in seconds
+    STATUS_POLL_INTERVAL: float = 0.0005
+    STATUS_POLL_MAX_INTERVAL: float = 0.05
+    STATUS_TIMEOUT: float = 2.0
+    CALIBRATION_TIMEOUT: float = 10.0
+
     def __init__(self, pin: int = 0, bus: int = 0, voltage_divider_offset: float = 52,
-                 current_shunt_offset: float = 0.01):
+                 current_shunt_offset: float = 0.01, interrupt_pin: int = 0, use_energy_register: bool = True):
         # Init spi
         self.pin: int = pin
         self.bus: int = bus
+        self.interrupt_pin: int = interrupt_pin
+        self.__interrupt_loop: asyncio.AbstractEventLoop = None
+        self.__interrupt_event: asyncio.Event = None
+        self.__is_resetting: bool = False
         GPIO.setup(self.pin, GPIO.OUT)
         # Input range (+-) in mV
         self.VOLTAGE_RANGE: float = 0.250
@@ -136,10 +167,16 @@ class PowerMeter:
         self.SIGN_BIT = 0x01 << 23
         self.DATA_READY = 0x01 << 23
         self.CONVERSION_READY = 0x01 << 20
+        # The chip accumulates energy in TOTAL_ENERGY_REGISTER, without it the power samples are integrated
+        self.has_energy_register: bool = use_energy_register
         self._spi = spidev.SpiDev()
         self._spi.open(bus, 0)
         self._spi.max_speed_hz = 500000
         self._spi.no_cs = True
+        if self.interrupt_pin > 0:
+            # The INT pin is active low
+            GPIO.setup(self.interrupt_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.add_event_detect(self.interrupt_pin, GPIO.FALLING, callback=self.__on_interrupt)
 
         # initial sync
         try:
@@ -180,7 +217,7 @@ class PowerMeter:
         except Exception as ex:
             print(ex)
 
-    def reset(self):
+    def __send_reset(self):
         self._send_to_register(self.CONFIG_REGISTER, self.CHIP_RESET)
         try:
             GPIO.output(self.pin, GPIO.LOW)
@@ -188,17 +225,99 @@ class PowerMeter:
             GPIO.output(self.pin, GPIO.HIGH)
         except Exception as ex:
             print(ex)
-        self._start_converting()
-        while not (self.__get_status() & self.CONVERSION_READY):
-            # Wait until conversion starts
-            pass
+        self._begin_converting()
 
-    def _start_converting(self):
+    def reset(self):
+        """
+        Reset the chip and wait until the conversion starts. Blocking.
+        :raises PowerMeterFault: If the conversion does not start in time
+        """
+        self.__send_reset()
+        self._wait_for_status(self.CONVERSION_READY)
+
+    async def reset_async(self):
+        """
+        Reset the chip in the SPI bus worker thread and wait until the conversion starts without blocking
+        the event loop. The meter must not be sampled until the reset is done, see is_resetting.
+        :raises PowerMeterFault: If the conversion does not start in time
+        """
+        self.__is_resetting = True
+        try:
+            await HardwareExecutor.run(f"spi{self.bus}", self.__send_reset)
+            await self.wait_for_status(self.CONVERSION_READY)
+        finally:
+            self.__is_resetting = False
+
+    @property
+    def is_resetting(self) -> bool:
+        return self.__is_resetting
+
+    def _begin_converting(self):
         self.__clear_status(self.CONVERSION_READY)
         self.__send(self.START_MULTI_CONVERT)
-        while not (self.__get_status() & self.CONVERSION_READY):
-            # Wait until conversion starts
-            pass
+
+    def _start_converting(self):
+        self._begin_converting()
+        self._wait_for_status(self.CONVERSION_READY)
+
+    def _wait_for_status(self, status_mask: int, timeout: float = STATUS_TIMEOUT):
+        """
+        Poll the status register with an exponential backoff until any of the status bits are set. Blocking.
+        :param status_mask: Status bits to wait for
+        :param timeout: Timeout in seconds
+        :raises PowerMeterFault: If the bits are not set before the timeout
+        """
+        deadline: float = time.monotonic() + timeout
+        interval: float = self.STATUS_POLL_INTERVAL
+        while not (self.__get_status() & status_mask):
+            remaining: float = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PowerMeterFault(self.pin, self.bus, status_mask, timeout)
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 2, self.STATUS_POLL_MAX_INTERVAL)
+
+    async def wait_for_status(self, status_mask: int, timeout: float = STATUS_TIMEOUT):
+        """
+        Wait until any of the status bits are set without blocking the event loop. The status register is polled
+        with an exponential backoff in the SPI bus worker thread. If the INT pin is connected, a falling edge
+        wakes up the waiting task before the backoff interval ends.
+        :param status_mask: Status bits to wait for
+        :param timeout: Timeout in seconds
+        :raises PowerMeterFault: If the bits are not set before the timeout
+        """
+        bus: str = f"spi{self.bus}"
+        loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+        deadline: float = loop.time() + timeout
+        interval: float = self.STATUS_POLL_INTERVAL
+        interrupt_event: asyncio.Event = None
+        if self.interrupt_pin > 0:
+            interrupt_event = asyncio.Event()
+            self.__interrupt_loop, self.__interrupt_event = loop, interrupt_event
+            await HardwareExecutor.run(bus, self._send_to_register, self.INTERRUPT_MASK_REGISTER, status_mask)
+        try:
+            while not (await HardwareExecutor.run(bus, self.__get_status) & status_mask):
+                remaining: float = deadline - loop.time()
+                if remaining <= 0:
+                    raise PowerMeterFault(self.pin, self.bus, status_mask, timeout)
+                if interrupt_event is not None:
+                    try:
+                        await asyncio.wait_for(interrupt_event.wait(), min(interval, remaining))
+                    except asyncio.TimeoutError:
+                        pass
+                    interrupt_event.clear()
+                else:
+                    await asyncio.sleep(min(interval, remaining))
+                interval = min(interval * 2, self.STATUS_POLL_MAX_INTERVAL)
+        finally:
+            if interrupt_event is not None:
+                self.__interrupt_loop, self.__interrupt_event = None, None
+                await HardwareExecutor.run(bus, self._send_to_register, self.INTERRUPT_MASK_REGISTER, 0)
+
+    def __on_interrupt(self, channel):
+        # Called from the GPIO event thread
+        loop, interrupt_event = self.__interrupt_loop, self.__interrupt_event
+        if loop is not None and interrupt_event is not None:
+            loop.call_soon_threadsafe(interrupt_event.set)
 
     def _stop_converting(self):
         self.__send(self.POWER_UP_HALT_CONTROL)
@@ -224,6 +343,38 @@ class PowerMeter:
             print(ex)
         return value
 
+    def read_snapshot(self) -> MeterSnapshot:
+        """
+        Read all the measurement registers in a single full-duplex burst under one chip select.
+        Each register is read by sending its read command followed by three SYNC0 bytes, which clock out its value.
+        :return: Measured values
+        """
+        registers: list = [self.LAST_CURRENT_REGISTER,
+                           self.LAST_VOLTAGE_REGISTER,
+                           self.LAST_POWER_REGISTER,
+                           self.TOTAL_ENERGY_REGISTER,
+                           self.RMS_CURRENT_REGISTER,
+                           self.RMS_VOLTAGE_REGISTER]
+        burst: list = []
+        for register in registers:
+            burst += [register & self.READ_REGISTER, self.SYNC0, self.SYNC0, self.SYNC0]
+        response: list = [0] * len(burst)
+        try:
+            GPIO.output(self.pin, GPIO.LOW)
+            response = self._spi.xfer2(burst)
+            GPIO.output(self.pin, GPIO.HIGH)
+        except Exception as ex:
+            print(ex)
+        values: list = [(response[i + 1] << 16) | (response[i + 2] << 8) | response[i + 3]
+                        for i in range(0, len(burst), 4)]
+        return MeterSnapshot(current=self.__signed_to_float(values[0]) * self.CURRENT_MULTIPLIER,
+                             voltage=self.__signed_to_float(values[1]) * self.VOLTAGE_MULTIPLIER,
+                             power=self.__signed_to_float(values[2]) * self.POWER_MULTIPLIER,
+                             energy=self.__signed_to_float(values[3]) * self.POWER_MULTIPLIER,
+                             # RMS registers are unsigned
+                             rms_current=values[4] / (self.SIGN_BIT << 1) * self.CURRENT_MULTIPLIER,
+                             rms_voltage=values[5] / (self.SIGN_BIT << 1) * self.VOLTAGE_MULTIPLIER)
+
     def __signed_to_float(self, data):
         """
         Convert signed int value to float
@@ -288,9 +439,7 @@ class PowerMeter:
         self.__clear_status(self.DATA_READY)
         cmd = self.CALIBRATE_CONTROL | (cmd & self.CALIBRATE_ALL)
         self.__send(cmd)
-        while not (self.__get_status() & self.DATA_READY):
-            # Wait until data ready
-            pass
+        self._wait_for_status(self.DATA_READY, self.CALIBRATION_TIMEOUT)
         self.__clear_status(self.DATA_READY)
         self._start_converting()
 
@@ -339,14 +488,28 @@ class LCDModule:
     """
     A class for LCD module with I2C support.
     Displays the current consumption/power of the power meter, connector availability and other important messages.
+    Messages are queued by priority and pre-empt the status page, the display is updated through a frame buffer
+    which only writes the changed characters.
     """
 
-    def __init__(self, lcd_info: dict):
-        self._lcd = None
-        self.is_lcd_supported: bool = lcd_info["is_supported"]
+    INFO_PRIORITY: int = 1
+    ERROR_PRIORITY: int = 2
+
+    def __init__(self, lcd_info: dict, lcd_device=None):
+        """
+        :param lcd_info: LCD settings
+        :param lcd_device: LCD to use instead of the one in the settings, e.g. a FakeLCD
+        """
+        self._lcd = lcd_device
+        self.is_lcd_supported: bool = lcd_info["is_supported"] or lcd_device is not None
         self._i2c_address: str = lcd_info["i2c_address"]
+        self._frame_buffer: LCDFrameBuffer = None
+        self.__messages: MessageQueue = MessageQueue()
+        self.__status_rows: list = ["", ""]
+        self.__is_status_changed: bool = False
+        self.__condition: threading.Condition = threading.Condition()
         try:
-            if self.is_lcd_supported:
+            if self._lcd is None and self.is_lcd_supported:
                 if is_full_string(self._i2c_address):
                     self._lcd = i2c_lcd(i2c_expander="PCF8574", address=int(self._i2c_address, 16), cols=16, rows=2)
                 else:
@@ -356,29 +519,79 @@ class LCDModule:
                                     pins_data=[21, 22, 23, 24],
                                     rows=2,
                                     cols=16)
+            if self._lcd is not None:
+                self._frame_buffer = LCDFrameBuffer(self._lcd, cols=16, rows=2)
                 self.clear()
+                threading.Thread(target=self.__render, name="lcd", daemon=True).start()
         except Exception as ex:
             self.is_lcd_supported = False
             print(ex)
 
     def clear(self):
-        if self._lcd is None:
+        if self._frame_buffer is None:
             return
-        self._lcd.clear()
+        HardwareExecutor.get_executor("i2c").submit(self._frame_buffer.clear).result()
 
-    async def __display_in_rows(self, row1_msg: str, row2_msg: str, delay: int):
-        if self._lcd is None or not self.is_lcd_supported:
+    def show_message(self, row1_msg: str, row2_msg: str, duration: float, priority: int = INFO_PRIORITY):
+        """
+        Queue a message. It is shown after the messages with the same or higher priority and pre-empts
+        the ones with a lower priority.
+        :param row1_msg: First row
+        :param row2_msg: Second row
+        :param duration: Display time in seconds
+        :param priority: Message priority
+        :return:
+        """
+        if self._frame_buffer is None or not self.is_lcd_supported:
             return
-        self.clear()
-        self._lcd.cursor_pos = (0, 0)
-        self._lcd.write_string(row1_msg)
-        self._lcd.cursor_pos = (1, 0)
-        self._lcd.write_string(row2_msg)
-        await asyncio.sleep(delay)
+        with self.__condition:
+            self.__messages.push(DisplayMessage([row1_msg, row2_msg], duration, priority))
+            self.__condition.notify()
+
+    def __set_status(self, row1_msg: str, row2_msg: str):
+        with self.__condition:
+            self.__status_rows = [row1_msg, row2_msg]
+            self.__is_status_changed = True
+            self.__condition.notify()
+
+    def __render(self):
+        """
+        Display the queued messages, or the status page when there are none. Runs in its own thread,
+        I2C writes are done in the worker thread of the bus.
+        :return:
+        """
+        while True:
+            with self.__condition:
+                message, order = self.__messages.pop()
+                rows: list = self.__status_rows if message is None else message.rows
+                self.__is_status_changed = False
+            try:
+                HardwareExecutor.get_executor("i2c").submit(self._frame_buffer.write, rows).result()
+            except Exception as ex:
+                print(ex)
+            with self.__condition:
+                if message is None:
+                    self.__condition.wait_for(lambda: len(self.__messages) > 0 or self.__is_status_changed)
+                    continue
+                end: float = time.monotonic() + message.remaining
+                while True:
+                    remaining: float = end - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    top_priority: int = self.__messages.peek_priority()
+                    if top_priority is not None and top_priority > message.priority:
+                        # Show the rest of the message after the more important one
+                        message.remaining = remaining
+                        self.__messages.push(message, order)
+                        break
+                    self.__condition.wait(remaining)
+
+    async def __display_in_rows(self, row1_msg: str, row2_msg: str, delay: int, priority: int = INFO_PRIORITY):
+        self.show_message(row1_msg, row2_msg, delay, priority)
 
     async def display_current_status(self, connector_id: int, is_charging: bool, consumption: float):
         """
-        Display the connector's current status to the LCD.
+        Display the connector's current status on the status page for 10 seconds.
         :param connector_id: A connector ID
         :param is_charging: Connector's charging state
         :param consumption: Current value of the meter
@@ -391,15 +604,15 @@ class LCDModule:
             else:
                 appendix = "Wh"
             row2_msg = f"Consumed: {consumption} {appendix}"
-        await self.__display_in_rows(row1_msg=f"Connector: {connector_id}",
-                                     row2_msg=row2_msg,
-                                     delay=10)
+        self.__set_status(row1_msg=f"Connector: {connector_id}", row2_msg=row2_msg)
+        await asyncio.sleep(10)
 
     async def display_card_detected(self):
         await self.__display_in_rows(row1_msg="Card read", row2_msg="", delay=3)
 
     async def display_invalid_card(self):
-        await self.__display_in_rows(row1_msg="Card", row2_msg="Unauthorized", delay=3)
+        await self.__display_in_rows(row1_msg="Card", row2_msg="Unauthorized", delay=3,
+                                     priority=LCDModule.ERROR_PRIORITY)
 
     async def start_charging_message(self, connector_id: int):
         await self.__display_in_rows(row1_msg="Started charging",
@@ -425,19 +638,23 @@ class LCDModule:
         if connector_id == -1:
             await self.__display_in_rows(row1_msg="Error",
                                          row2_msg="",
-                                         delay=3)
+                                         delay=3,
+                                         priority=LCDModule.ERROR_PRIORITY)
         else:
             await self.__display_in_rows(row1_msg="Fault on",
                                          row2_msg=f"Connector {connector_id}:",
-                                         delay=3)
+                                         delay=3,
+                                         priority=LCDModule.ERROR_PRIORITY)
             await self.__display_in_rows(row1_msg=msg,
                                          row2_msg="",
-                                         delay=5)
+                                         delay=5,
+                                         priority=LCDModule.ERROR_PRIORITY)
 
     async def not_connected_error(self):
         await self.__display_in_rows(row1_msg="Charging",
                                      row2_msg="unavailable",
-                                     delay=4)
+                                     delay=4,
+                                     priority=LCDModule.ERROR_PRIORITY)
 
 
 class PN532Reader:
@@ -451,8 +668,20 @@ class PN532Reader:
         self._reader: PN532_I2C = PN532_I2C(self._i2c, debug=False, reset=self._reset_pin, req=self._req_pin)
         self._reader.SAM_configuration()
 
-    def read_passive(self):
-        return self._reader.read_passive_target(timeout=.3)
+    def read_passive(self, timeout: float = .3):
+        return self._reader.read_passive_target(timeout=timeout)
+
+    def listen_for_passive_target(self):
+        """
+        Start detecting a tag, the IRQ pin goes low when a tag is found.
+        """
+        return self._reader.listen_for_passive_target()
+
+    def get_passive_target(self):
+        """
+        Get the UID of the tag found after listen_for_passive_target.
+        """
+        return self._reader.get_passive_target(timeout=.05)
 
     def reset(self):
         print("Reset PN532")
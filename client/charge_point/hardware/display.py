@@ -0,0 +1,154 @@
+import heapq
+import itertools
+import time
+
+
+class LCDFrameBuffer:
+    """
+    A virtual frame buffer of a character LCD. Only the character cells that differ from what is already shown
+    are written, without clearing the display.
+    """
+
+    def __init__(self, lcd, cols: int = 16, rows: int = 2):
+        self._lcd = lcd
+        self.cols: int = cols
+        self.rows: int = rows
+        # Unknown until the first frame is written
+        self._cells: list = None
+
+    def write(self, rows: list):
+        """
+        Write the rows to the display, changing only the cells that differ.
+        :param rows: List of row strings, longer rows are cut off
+        :return: Number of characters written
+        """
+        frame: list = [f"{row:<{self.cols}}"[:self.cols] for row in rows[:self.rows]]
+        frame += [" " * self.cols] * (self.rows - len(frame))
+        written: int = 0
+        for row_index, row in enumerate(frame):
+            shown: str = None if self._cells is None else self._cells[row_index]
+            col: int = 0
+            while col < self.cols:
+                if shown is not None and shown[col] == row[col]:
+                    col += 1
+                    continue
+                # Write the whole run of changed cells after a single cursor move
+                end: int = col
+                while end < self.cols and (shown is None or shown[end] != row[end]):
+                    end += 1
+                self._lcd.cursor_pos = (row_index, col)
+                self._lcd.write_string(row[col:end])
+                written += end - col
+                col = end
+        self._cells = frame
+        return written
+
+    def clear(self):
+        self._lcd.clear()
+        self._cells = [" " * self.cols] * self.rows
+
+    @property
+    def get_rows(self) -> list:
+        if self._cells is None:
+            return []
+        return list(self._cells)
+
+
+class FakeLCD:
+    """
+    A headless HD44780 LCD behind a PCF8574 I2C expander. Counts the bytes that would be sent over I2C:
+    the display is driven in 4-bit mode and each nibble is strobed with the enable pin, so an LCD byte
+    costs four I2C bytes.
+    """
+    I2C_BYTES_PER_LCD_BYTE: int = 4
+
+    def __init__(self, cols: int = 16, rows: int = 2):
+        self.cols: int = cols
+        self.rows: int = rows
+        self.lcd_bytes: int = 0
+        self.clears: int = 0
+        self._cursor: tuple = (0, 0)
+        self._cells: list = [[" "] * cols for _ in range(rows)]
+
+    @property
+    def cursor_pos(self) -> tuple:
+        return self._cursor
+
+    @cursor_pos.setter
+    def cursor_pos(self, value: tuple):
+        # Set DDRAM address command
+        self.lcd_bytes += 1
+        self._cursor = value
+
+    def write_string(self, value: str):
+        row, col = self._cursor
+        for char in value:
+            if col < self.cols:
+                self._cells[row][col] = char
+            col += 1
+            self.lcd_bytes += 1
+        self._cursor = (row, col)
+
+    def clear(self):
+        self.lcd_bytes += 1
+        self.clears += 1
+        self._cells = [[" "] * self.cols for _ in range(self.rows)]
+        self._cursor = (0, 0)
+
+    @property
+    def i2c_bytes(self) -> int:
+        return self.lcd_bytes * FakeLCD.I2C_BYTES_PER_LCD_BYTE
+
+    @property
+    def get_rows(self) -> list:
+        return ["".join(row) for row in self._cells]
+
+
+class DisplayMessage:
+    """
+    A message shown on the display for a duration. Messages waiting longer than max_wait seconds expire.
+    """
+
+    def __init__(self, rows: list, duration: float, priority: int, max_wait: float = 10):
+        self.rows: list = rows
+        self.remaining: float = duration
+        self.priority: int = priority
+        self.expires: float = time.monotonic() + max_wait
+
+    @property
+    def is_expired(self) -> bool:
+        return time.monotonic() > self.expires
+
+
+class MessageQueue:
+    """
+    A queue of display messages ordered by priority, messages with the same priority are shown in order.
+    """
+
+    def __init__(self):
+        self._heap: list = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, message: DisplayMessage, order: int = None):
+        if order is None:
+            order = next(self._counter)
+        heapq.heappush(self._heap, (-message.priority, order, message))
+
+    def pop(self) -> (DisplayMessage, int):
+        """
+        Get the message with the highest priority, dropping the expired ones.
+        :return: Message and its order or None, None if the queue is empty
+        """
+        while len(self._heap) > 0:
+            _, order, message = heapq.heappop(self._heap)
+            if not message.is_expired:
+                return message, order
+        return None, None
+
+    def peek_priority(self) -> int:
+        if len(self._heap) == 0:
+            return None
+        return -self._heap[0][0]
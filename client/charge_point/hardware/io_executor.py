@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from charge_point.data.running_statistics import RunningStatistics
+
+logger = logging.getLogger('chargepi_logger')
+
+
+class HardwareExecutor:
+    """
+    A singleton executor for blocking SPI, I2C and GPIO transactions. Each bus gets a single worker thread,
+    so transactions on the same bus are serialized, while the event loop serving the OCPP websocket never waits
+    for the hardware.
+    """
+    __executors: dict = {}
+
+    @staticmethod
+    def get_executor(bus: str) -> ThreadPoolExecutor:
+        if bus not in HardwareExecutor.__executors:
+            HardwareExecutor.__executors[bus] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"hw_{bus}")
+        return HardwareExecutor.__executors[bus]
+
+    @staticmethod
+    async def run(bus: str, function, *args, **kwargs):
+        """
+        Run a blocking hardware call in the worker thread of the bus.
+        :param bus: Name of the bus, e.g. "spi0" or "i2c"
+        :param function: Blocking function
+        :return: Result of the function
+        """
+        return await asyncio.get_event_loop().run_in_executor(HardwareExecutor.get_executor(bus),
+                                                              functools.partial(function, *args, **kwargs))
+
+    @staticmethod
+    def shutdown():
+        for executor in HardwareExecutor.__executors.values():
+            executor.shutdown(wait=True)
+        HardwareExecutor.__executors.clear()
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping task. The lag is the time the loop was blocked
+    by other callbacks, e.g. by blocking hardware I/O.
+    """
+
+    def __init__(self, interval: float = 0.5, report_interval: float = 300, warning_threshold: float = 0.1):
+        self.interval: float = interval
+        self.report_interval: float = report_interval
+        self.warning_threshold: float = warning_threshold
+        self.statistics: RunningStatistics = RunningStatistics()
+
+    async def run(self):
+        last_report: float = time.monotonic()
+        while True:
+            expected: float = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now: float = time.monotonic()
+            lag: float = max(now - expected, 0.0)
+            self.statistics.add(lag)
+            if lag > self.warning_threshold:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.1f} ms")
+            if now - last_report >= self.report_interval:
+                logger.debug(f"Event loop lag: mean {self.statistics.mean * 1000:.2f} ms, "
+                             f"max {self.statistics.max * 1000:.2f} ms")
+                self.statistics = RunningStatistics()
+                last_report = now
@@ -8,13 +8,48 @@ _LED_BRIGHTNESS: int = 255
 _LED_INVERT: bool = False
 _LED_CHANNEL: int = 0
 
+
+class LEDStripDriver:
+    """
+    A long-lived WS281x LED strip driver. The PixelStrip and its DMA channel are set up once and kept open,
+    so a status change only writes the new frame to the strip.
+    """
+
+    def __init__(self, led_count: int, invert: bool = _LED_INVERT, brightness: int = _LED_BRIGHTNESS):
+        self.led_count: int = led_count
+        self._strip: PixelStrip = PixelStrip(led_count, _LED_PIN,
+                                             _LED_FREQ_HZ, _LED_DMA,
+                                             invert, brightness,
+                                             _LED_CHANNEL)
+        self._strip.begin()
+        # Unknown until the first frame is shown
+        self._frame: list = None
+
+    def show(self, colors: list):
+        """
+        Display the colors on the strip. LEDs without a color are turned off.
+        :param colors: List of colors, one per LED
+        :return:
+        """
+        frame: list = [int(color) for color in colors[:self.led_count]]
+        frame += [0] * (self.led_count - len(frame))
+        if frame == self._frame:
+            return
+        for index, color in enumerate(frame):
+            self._strip.setPixelColor(index, color)
+        self._strip.show()
+        self._frame = frame
+
+    def clear(self):
+        self.show([])
+
+    @property
+    def get_frame(self) -> list:
+        if self._frame is None:
+            return []
+        return list(self._frame)
+
+
 if __name__ == "__main__":
-    # json_arg = json.loads(sys.argv[1])
-    strip: PixelStrip = PixelStrip(len(sys.argv[1:]), _LED_PIN,
-                                   _LED_FREQ_HZ, _LED_DMA,
-                                   _LED_INVERT, _LED_BRIGHTNESS,
-                                   _LED_CHANNEL)
-    strip.begin()
-    for index, color in enumerate(sys.argv[1:]):
-        strip.setPixelColor(index, int(color))
-    strip.show()
+    driver: LEDStripDriver = LEDStripDriver(len(sys.argv[1:]))
+    driver.show(sys.argv[1:])
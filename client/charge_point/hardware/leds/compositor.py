@@ -0,0 +1,261 @@
+import asyncio
+import math
+import time
+
+OFF: int = 0
+
+
+def scale_color(color: int, factor: float) -> int:
+    """
+    Scale the brightness of a 0xWWRRGGBB color.
+    :param color: Color value
+    :param factor: Brightness factor between 0 and 1
+    :return: Scaled color
+    """
+    factor = min(max(factor, 0.0), 1.0)
+    scaled: int = 0
+    for shift in (24, 16, 8, 0):
+        scaled |= int(((color >> shift) & 0xFF) * factor) << shift
+    return scaled
+
+
+class Blink:
+    """
+    Blink a color a number of times, then end.
+    """
+    # Seconds between two renders of the effect, 0 renders it at the frame rate
+    refresh_interval: float = 0
+
+    def __init__(self, color: int, interval: float = 0.3, count: int = 2):
+        self.color: int = color
+        self.interval: float = interval
+        self.duration: float = 2 * interval * count
+
+    def color_at(self, elapsed: float, base_color: int) -> int:
+        return self.color if elapsed % (2 * self.interval) < self.interval else OFF
+
+    def is_done(self, elapsed: float) -> bool:
+        return elapsed >= self.duration
+
+
+class Pulse:
+    """
+    Fade a color in and out until the overlay is removed.
+    """
+    refresh_interval: float = 0
+
+    def __init__(self, color: int, period: float = 2.0, min_brightness: float = 0.1):
+        self.color: int = color
+        self.period: float = period
+        self.min_brightness: float = min_brightness
+        self.duration: float = math.inf
+
+    def color_at(self, elapsed: float, base_color: int) -> int:
+        wave: float = (1 - math.cos(2 * math.pi * elapsed / self.period)) / 2
+        return scale_color(self.color, self.min_brightness + (1 - self.min_brightness) * wave)
+
+    def is_done(self, elapsed: float) -> bool:
+        return False
+
+
+class Progress:
+    """
+    Show the charging progress as the brightness of the color until the overlay is removed.
+    The progress changes slowly, so it is rendered once per refresh interval instead of at the frame rate.
+    """
+
+    def __init__(self, color: int, get_progress, min_brightness: float = 0.2, refresh_interval: float = 1.0):
+        """
+        :param color: Color at full progress
+        :param get_progress: Function returning the progress between 0 and 1
+        :param min_brightness: Brightness at no progress
+        :param refresh_interval: Seconds between two renders of the progress
+        """
+        self.color: int = color
+        self.get_progress = get_progress
+        self.min_brightness: float = min_brightness
+        self.refresh_interval: float = refresh_interval
+        self.duration: float = math.inf
+
+    def color_at(self, elapsed: float, base_color: int) -> int:
+        progress: float = min(max(self.get_progress(), 0.0), 1.0)
+        return scale_color(self.color, self.min_brightness + (1 - self.min_brightness) * progress)
+
+    def is_done(self, elapsed: float) -> bool:
+        return False
+
+
+class FakeLEDStrip:
+    """
+    An LED strip recording the frames it was asked to show, for use without the WS281x hardware.
+    """
+
+    def __init__(self, led_count: int):
+        self.led_count: int = led_count
+        self.frames: list = []
+
+    def show(self, colors: list):
+        self.frames.append(list(colors))
+
+    def clear(self):
+        self.show([OFF] * self.led_count)
+
+    @property
+    def get_frame(self) -> list:
+        if len(self.frames) == 0:
+            return []
+        return list(self.frames[-1])
+
+
+class LEDCompositor:
+    """
+    Composes the frames of an LED strip from a base color per LED and overlay effects on top of it.
+    Frames are rendered at a fixed frame rate while animated effects are running, slowly changing effects like
+    Progress are rendered once per their refresh interval. Changes in between are coalesced and a frame is only
+    pushed to the strip when its pixels changed.
+    """
+
+    def __init__(self, strip, led_count: int, frame_rate: float = 30, clock=time.monotonic):
+        """
+        :param strip: LED strip with a show(colors) method
+        :param led_count: Number of LEDs
+        :param frame_rate: Frames per second while effects are running
+        :param clock: Monotonic clock in seconds
+        """
+        self._strip = strip
+        self.led_count: int = led_count
+        self.frame_interval: float = 1 / frame_rate
+        self._clock = clock
+        self._base_colors: list = [OFF] * led_count
+        # LED index -> {overlay name: (effect, start time)}, the last added overlay is on top
+        self._overlays: dict = {}
+        self._last_frame: list = None
+        self.frames_shown: int = 0
+        self.__changed: asyncio.Event = None
+        self.__is_running: bool = False
+
+    def set_base_color(self, index: int, color: int):
+        if 0 <= index < self.led_count and self._base_colors[index] != color:
+            self._base_colors[index] = color
+            self.__notify()
+
+    def set_base_colors(self, colors: list):
+        for index, color in enumerate(colors[:self.led_count]):
+            self.set_base_color(index, color)
+
+    def set_overlay(self, index: int, name: str, effect):
+        """
+        Put an effect over the base color of an LED. An overlay with the same name is replaced.
+        :param index: LED index
+        :param name: Overlay name
+        :param effect: Blink, Pulse, Progress or any object with color_at, is_done and refresh_interval
+        :return:
+        """
+        if not 0 <= index < self.led_count:
+            return
+        overlays: dict = self._overlays.setdefault(index, {})
+        overlays.pop(name, None)
+        overlays[name] = (effect, self._clock())
+        self.__notify()
+
+    def remove_overlay(self, index: int, name: str):
+        if self._overlays.get(index, {}).pop(name, None) is not None:
+            self.__notify()
+
+    def has_overlay(self, index: int, name: str) -> bool:
+        return name in self._overlays.get(index, {})
+
+    async def play(self, index: int, name: str, effect):
+        """
+        Put an effect with a finite duration over an LED and wait until it ends.
+        :return:
+        """
+        self.set_overlay(index, name, effect)
+        await asyncio.sleep(effect.duration)
+
+    def render(self) -> list:
+        """
+        Compose the current frame and drop the overlays that ended.
+        :return: List of colors
+        """
+        now: float = self._clock()
+        frame: list = list(self._base_colors)
+        for index, overlays in self._overlays.items():
+            for name, (effect, started) in list(overlays.items()):
+                if effect.is_done(now - started):
+                    del overlays[name]
+                    continue
+                frame[index] = effect.color_at(now - started, frame[index])
+        return frame
+
+    def update(self) -> bool:
+        """
+        Render a frame and show it if any pixel changed.
+        :return: True if the frame was shown
+        """
+        frame: list = self.render()
+        if frame == self._last_frame:
+            return False
+        self._strip.show(frame)
+        self._last_frame = frame
+        self.frames_shown += 1
+        return True
+
+    @property
+    def is_animating(self) -> bool:
+        """
+        True if an effect is rendered at the frame rate.
+        """
+        refresh_interval: float = self.refresh_interval
+        return refresh_interval is not None and refresh_interval <= self.frame_interval
+
+    @property
+    def refresh_interval(self) -> float:
+        """
+        Seconds until the overlays need to be rendered again, None if there are no overlays.
+        """
+        intervals: list = [effect.refresh_interval for overlays in self._overlays.values()
+                           for effect, started in overlays.values()]
+        if len(intervals) == 0:
+            return None
+        return max(min(intervals), self.frame_interval)
+
+    def clear(self):
+        """
+        Turn off all the LEDs immediately, e.g. at cleanup.
+        :return:
+        """
+        self._base_colors = [OFF] * self.led_count
+        self._overlays.clear()
+        self.update()
+
+    def stop(self):
+        self.__is_running = False
+        self.__notify()
+
+    def __notify(self):
+        if self.__changed is not None:
+            self.__changed.set()
+
+    async def run(self):
+        """
+        Render frames at the frame rate while animated effects are running, otherwise wait for a change or
+        the refresh interval of the overlays.
+        :return:
+        """
+        self.__changed = asyncio.Event()
+        self.__is_running = True
+        self.update()
+        while self.__is_running:
+            if self.is_animating:
+                await asyncio.sleep(self.frame_interval)
+            else:
+                try:
+                    await asyncio.wait_for(self.__changed.wait(), self.refresh_interval)
+                    # Coalesce the changes made within the same frame
+                    await asyncio.sleep(self.frame_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self.__changed.clear()
+            if self.__is_running:
+                self.update()
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+import RPi.GPIO as GPIO
+from string_utils import is_full_string
+from charge_point.hardware.components import PN532Reader
+from charge_point.hardware.io_executor import HardwareExecutor
+
+logger = logging.getLogger('chargepi_logger')
+
+
+class RFIDReaderService:
+    """
+    Reads RFID/NFC tags and puts their UIDs on an asyncio queue. A UID is ignored while it keeps being read and
+    for hold_off seconds after it was last seen, so a card left on the reader counts as a single tap.
+    The PN532 can signal a detected card on its IRQ pin, otherwise the reader is polled with an interval that
+    grows while no card is present. Either way, the reader is read at most once per min_poll_interval.
+    """
+
+    def __init__(self, reader, reader_model: str, queue: asyncio.Queue, hold_off: float = 2.0, irq_pin: int = 0,
+                 min_poll_interval: float = 0.1, max_poll_interval: float = 0.5):
+        """
+        :param reader: SimpleMFRC522 or PN532Reader
+        :param reader_model: "MFRC522" or "PN532"
+        :param queue: Queue for the UIDs of the tapped tags
+        :param hold_off: Time in seconds a UID must be absent before it is reported again
+        :param irq_pin: GPIO pin connected to the PN532 IRQ pin, 0 to poll
+        :param min_poll_interval: Polling interval after a tag was read
+        :param max_poll_interval: Polling interval when no tag is present
+        """
+        self._reader = reader
+        self.reader_model: str = reader_model
+        self.queue: asyncio.Queue = queue
+        self.hold_off: float = hold_off
+        self.irq_pin: int = irq_pin if isinstance(reader, PN532Reader) else 0
+        self.min_poll_interval: float = min_poll_interval
+        self.max_poll_interval: float = max_poll_interval
+        # UID -> monotonic time it was last read
+        self._last_seen: dict = {}
+        self.__irq_event: asyncio.Event = None
+        # The MFRC522 is on the SPI bus, the PN532 on the I2C bus
+        self.__bus: str = "i2c" if isinstance(reader, PN532Reader) else "spi0"
+
+    def _read_uid(self) -> str:
+        """
+        Read the UID of a tag in the field. Blocking.
+        :return: UID or an empty string
+        """
+        uid: str = ""
+        try:
+            if self.reader_model == "MFRC522":
+                tag_id = self._reader.read_id_no_block()
+                if tag_id is not None:
+                    uid = hex(tag_id).strip("0x").upper()[:-2]
+            elif self.reader_model == "PN532":
+                if self.irq_pin > 0:
+                    uid_bytes: bytearray = self._reader.get_passive_target()
+                else:
+                    uid_bytes: bytearray = self._reader.read_passive(timeout=0.05)
+                if uid_bytes is not None:
+                    uid = uid_bytes.hex().upper()
+        except Exception as ex:
+            logger.debug("Reading the tag failed", exc_info=ex)
+        return uid
+
+    def is_new_tap(self, uid: str, now: float = None) -> bool:
+        """
+        Check if the UID was absent for at least hold_off seconds and remember it as seen.
+        :param uid: Tag UID
+        :param now: Monotonic time of the read
+        :return: True if the read should be reported
+        """
+        if now is None:
+            now = time.monotonic()
+        last_seen: float = self._last_seen.get(uid)
+        self._last_seen[uid] = now
+        # Forget the tags that left the field a while ago
+        for seen_uid, seen_time in list(self._last_seen.items()):
+            if now - seen_time > self.hold_off:
+                del self._last_seen[seen_uid]
+        return last_seen is None or now - last_seen >= self.hold_off
+
+    async def __wait_for_tag(self, interval: float):
+        if self.irq_pin > 0:
+            # Arm the reader, the IRQ pin goes low when a tag is detected
+            await HardwareExecutor.run(self.__bus, self._reader.listen_for_passive_target)
+            self.__irq_event.clear()
+            try:
+                await asyncio.wait_for(self.__irq_event.wait(), self.max_poll_interval * 10)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(interval)
+
+    async def run(self):
+        """
+        Read the tags until cancelled.
+        :return:
+        """
+        if self.irq_pin > 0:
+            loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+            self.__irq_event = asyncio.Event()
+            GPIO.setup(self.irq_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.add_event_detect(self.irq_pin, GPIO.FALLING,
+                                  callback=lambda channel: loop.call_soon_threadsafe(self.__irq_event.set))
+        interval: float = self.min_poll_interval
+        while True:
+            try:
+                await self.__wait_for_tag(interval)
+                uid: str = await HardwareExecutor.run(self.__bus, self._read_uid)
+                if is_full_string(uid):
+                    interval = self.min_poll_interval
+                    if self.is_new_tap(uid):
+                        logger.info(f"Read tag {uid}")
+                        print(f"Read tag {uid}")
+                        self.queue.put_nowait(uid)
+                else:
+                    interval = min(interval * 2, self.max_poll_interval)
+                if self.irq_pin > 0:
+                    # A card left on the reader wakes the loop again right away, throttle the reads
+                    await asyncio.sleep(self.min_poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logger.error("Exception while reading RFID", exc_info=ex)
+                print(str(ex))
+                if isinstance(self._reader, PN532Reader):
+                    await HardwareExecutor.run(self.__bus, self._reader.reset)
+                await asyncio.sleep(self.max_poll_interval)
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger('chargepi_logger')
+
+
+class FatalTaskError(Exception):
+    """
+    Raised by a supervised task when the client cannot continue, e.g. because of invalid settings.
+    """
+    pass
+
+
+class TaskSupervisor:
+    """
+    Runs the long-lived tasks of the client (OCPP session, RFID reader, display, sampler...) as children
+    of a single event loop. A task that fails is restarted with an exponential backoff, the backoff is reset when
+    the task ran for longer than the max backoff. A FatalTaskError stops all the tasks.
+    Blocking drivers are bridged to the loop through the hardware executor, other threads can submit coroutines
+    with run_threadsafe.
+    """
+
+    def __init__(self, min_backoff: float = 1, max_backoff: float = 60):
+        self.min_backoff: float = min_backoff
+        self.max_backoff: float = max_backoff
+        self._loop: asyncio.AbstractEventLoop = None
+        self._tasks: dict = {}
+        self._restarts: dict = {}
+        self.__fatal_error: BaseException = None
+        self.__stopped: asyncio.Event = None
+
+    def add(self, name: str, task_function, restart: bool = True):
+        """
+        Start a supervised task.
+        :param name: Unique name of the task
+        :param task_function: Coroutine function without arguments
+        :param restart: Restart the task when it fails or returns
+        :return:
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+            self.__stopped = asyncio.Event()
+        if name in self._tasks and not self._tasks[name].done():
+            return
+        self._restarts[name] = 0
+        self._tasks[name] = asyncio.ensure_future(self.__supervise(name, task_function, restart))
+
+    async def __supervise(self, name: str, task_function, restart: bool):
+        backoff: float = self.min_backoff
+        while True:
+            started: float = time.monotonic()
+            try:
+                await task_function()
+                logger.debug(f"Task {name} ended")
+            except asyncio.CancelledError:
+                raise
+            except FatalTaskError as ex:
+                logger.error(f"Task {name} cannot continue", exc_info=ex)
+                self.__fatal_error = ex
+                self.__stopped.set()
+                return
+            except Exception as ex:
+                logger.error(f"Task {name} failed", exc_info=ex)
+                print(f"Task {name} failed: {ex}")
+            if not restart:
+                return
+            if time.monotonic() - started > self.max_backoff:
+                backoff = self.min_backoff
+            self._restarts[name] += 1
+            logger.info(f"Restarting task {name} in {backoff} s")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def get_restarts(self, name: str) -> int:
+        return self._restarts.get(name, 0)
+
+    def run_threadsafe(self, coroutine):
+        """
+        Run a coroutine on the supervisor's loop from another thread.
+        :param coroutine: Coroutine object
+        :return: concurrent.futures.Future of the result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def stop(self):
+        if self.__stopped is not None:
+            self.__stopped.set()
+
+    async def wait(self):
+        """
+        Wait until the supervisor is stopped, then cancel all the tasks.
+        :raises FatalTaskError: If a task stopped the supervisor
+        """
+        await self.__stopped.wait()
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        if self.__fatal_error is not None:
+            raise self.__fatal_error
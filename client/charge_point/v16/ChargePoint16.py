@@ -3,7 +3,6 @@ import logging
 import time
 import os
 import sys
-import subprocess
 from semantic_version import Version
 from string_utils import is_full_string
 from ocpp.v16 import call, call_result
@@ -12,16 +11,22 @@ import ocpp.v16.enums as enums
 from ocpp.v16.enums import ChargePointStatus as status, ChargePointErrorCode as error_code, Reason as reason, \
     Action as action
 from ocpp.routing import on
+from websockets import ConnectionClosed
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import charge_point.responses as responses
 from charge_point.data.sessions import ChargingSession as s_responses
 from datetime import datetime, timedelta
 from charge_point.hardware.components import LEDStrip
+from charge_point.hardware.leds.LEDStrip import LEDStripDriver
+from charge_point.hardware.leds.compositor import LEDCompositor, Blink, Progress
 from charge_point.v16.connector_v16 import ConnectorV16
 from charge_point.connectors.ChargingConnector import ConnectorSettingsManager
+from charge_point.connectors.registry import ConnectorRegistry
 from charge_point.scheduler import SchedulerManager
 from charge_point.data.auth.authorization_cache import AuthorizationCache as AuthCache
-from charge_point.v16.configuration.configuration_manager import ConfigurationManager
+from charge_point.data.auth.single_flight import SingleFlight
+from charge_point.data.auth.revalidator import TagRevalidator
+from charge_point.v16.configuration.configuration_manager import ConfigurationManager, ConfigurationSnapshot
 import wget
 from charge_point.data.update_manager import update_target_version, get_next_version, perform_update
 
@@ -44,26 +49,41 @@ class ChargePointV16(cp):
         else:
             raise Exception("Not initialized")
 
-    def __init__(self, id, connection, charge_point_info: dict, hardware_info: dict):
+    def __init__(self, id, connection, charge_point_info: dict, hardware_info: dict,
+                 authorization_cache: AuthCache = None):
         if ChargePointV16.__instance is not None:
             return
         self.__charging_configuration: ConfigurationManager = ConfigurationManager()
-        super().__init__(id, connection,
-                         int(self.__charging_configuration.get_configuration_variable_value("ConnectionTimeOut")))
+        super().__init__(id, connection, self.__charging_configuration.get_snapshot.connection_timeout)
         self.__scheduler: AsyncIOScheduler = SchedulerManager.getScheduler()
         ChargePointV16.__instance = self
         # Add a heartbeat to the scheduler
         self.__scheduler.add_job(self.heartbeat, 'interval',
-                                 seconds=int(self.__charging_configuration.get_configuration_variable_value(
-                                     "HeartbeatInterval")))
+                                 seconds=self.__charging_configuration.get_snapshot.heartbeat_interval)
         self.__is_available: bool = True
         self.charge_point_info: dict = charge_point_info
         self.hardware_info: dict = hardware_info
-        self._ChargePointConnectors: list = list()
-        self.__authorization_cache: AuthCache = AuthCache(
-            self.__charging_configuration.get_configuration_variable_value("AuthorizationCacheEnabled") == "true")
-        self.__authorization_cache.set_max_cached_tags(
-            self.__charging_configuration.get_configuration_variable_value("LocalListMaxLength") == "true")
+        self._connector_registry: ConnectorRegistry = ConnectorRegistry()
+        # The cache is loaded at boot, so the tags can be authorized before the connection is established
+        if authorization_cache is None:
+            authorization_cache = AuthCache()
+        self.__authorization_cache: AuthCache = authorization_cache
+        self.__authorization_cache.set_cache_supported(
+            self.__charging_configuration.get_snapshot.authorization_cache_enabled)
+        self.__authorization_cache.set_local_list_supported(
+            self.__charging_configuration.get_snapshot.local_auth_list_enabled)
+        self.__authorization_cache.set_max_local_tags(
+            self.__charging_configuration.get_snapshot.local_auth_list_max_length)
+        # Concurrent authorizations of a tag share one request, rejected tags are not sent again for a while
+        self.__authorize_requests: SingleFlight = SingleFlight(
+            is_negative=lambda tag_info: tag_info["status"] in (enums.AuthorizationStatus.blocked,
+                                                                enums.AuthorizationStatus.expired,
+                                                                enums.AuthorizationStatus.invalid))
+        # A rejected tag is not rejected from memory anymore once the local list or the cache accepts it
+        self.__authorization_cache.set_tag_listener(self.__on_tag_updated)
+        # Refresh the cached tags nearing expiry in the background
+        self.__tag_revalidator: TagRevalidator = TagRevalidator(self.__authorization_cache, self.__authorize_tag)
+        self.__scheduler.add_job(self.__tag_revalidator.run_once, 'interval', seconds=60, max_instances=1)
         connectors = ConnectorSettingsManager.get_connectors_from_evse(1)
         # Add all the connectors specified in the connectors.json
         for connector in connectors:
@@ -74,8 +94,7 @@ class ChargePointV16(cp):
                                  connector_type=connector["type"],
                                  relay_settings=relay_settings,
                                  power_meter_settings=power_meter_settings)
-        # Sort by EVSE ID
-        # self._ChargePointConnectors.sort(key=(lambda conn: (conn.evse_id, conn.connector_id)))
+        self._led_compositor: LEDCompositor = self._get_LED_compositor()
         self._update_LED_status(self._get_LED_colors())
 
     def __add_connector(self, connector_id: int, connector_type: str, power_meter_settings: dict, relay_settings: dict):
@@ -86,8 +105,8 @@ class ChargePointV16(cp):
         :return:
         """
         if self.__find_connector_with_id(connector_id) is None and connector_id > 0:
-            list_length: int = len(self._ChargePointConnectors)
-            if list_length != 0 and connector_id != self._ChargePointConnectors[list_length - 1].connector_id + 1:
+            list_length: int = len(self.get_connectors)
+            if list_length != 0 and connector_id != self.get_connectors[list_length - 1].connector_id + 1:
                 return
             connector: ConnectorV16 = ConnectorV16(evse_id=1,
                                                    connector_id=connector_id,
@@ -103,12 +122,16 @@ class ChargePointV16(cp):
                                                    power_meter_min_power=float(power_meter_settings["min_power"]),
                                                    max_charging_time=self.charge_point_info["max_charging_time"],
                                                    stop_transaction_function=self.__stop_charging_connector_with_id,
-                                                   send_meter_values_function=self.send_meter_values)
-            self._ChargePointConnectors.append(connector)
+                                                   send_meter_values_function=self.send_meter_values,
+                                                   power_meter_interrupt_pin=int(
+                                                       power_meter_settings.get("interrupt_pin", 0)),
+                                                   power_meter_energy_register=bool(
+                                                       power_meter_settings.get("energy_register", True)))
+            self._connector_registry.add(connector)
 
     @property
     def get_connectors(self) -> list:
-        return self._ChargePointConnectors
+        return self._connector_registry.get_connectors
 
     def __get_connector_index(self, connector: ConnectorV16):
         """
@@ -127,11 +150,7 @@ class ChargePointV16(cp):
         Find all connectors with charging status.
         :return: List of connectors
         """
-        array = []
-        for connector in self.get_connectors:
-            if connector.is_charging():
-                array.append(connector)
-        return array
+        return self._connector_registry.get_charging()
 
     def __find_available_connector(self) -> ConnectorV16:
         """
@@ -146,8 +165,7 @@ class ChargePointV16(cp):
         :param connector_id: A connector ID
         :return: A connector
         """
-        return next((connector for connector in self.get_connectors
-                     if connector.connector_id == connector_id), None)
+        return self._connector_registry.get(1, connector_id)
 
     def __find_connector_with_transaction_id(self, transaction_id: str) -> ConnectorV16:
         """
@@ -155,8 +173,7 @@ class ChargePointV16(cp):
         :param transaction_id: A transaction ID
         :return: A connector
         """
-        return next((connector for connector in self.__find_charging_connectors()
-                     if connector.get_current_transaction_id == str(transaction_id)), None)
+        return self._connector_registry.find_with_transaction_id(transaction_id)
 
     def __find_connector_with_tag_id(self, id_tag: str) -> ConnectorV16:
         """
@@ -164,8 +181,7 @@ class ChargePointV16(cp):
         :param id_tag: A tag ID
         :return: A connector
         """
-        return next((connector for connector in self.get_connectors
-                     if connector.get_current_tag_id == id_tag), None)
+        return self._connector_registry.find_with_tag_id(id_tag)
 
     async def __is_tag_authorized(self, id_tag: str, is_remote_request: bool) -> bool:
         """
@@ -174,23 +190,59 @@ class ChargePointV16(cp):
         :return: True or false
         """
         print("Authorizing tag")
-        if self.__charging_configuration.get_configuration_variable_value("LocalPreAuthorize") == "true" \
-                and self.__charging_configuration.get_configuration_variable_value(
-            "AuthorizationCacheEnabled") == "true":
+        configuration: ConfigurationSnapshot = self.__charging_configuration.get_snapshot
+        if configuration.local_pre_authorize and configuration.authorization_cache_enabled:
             if await self.__authorization_cache.is_tag_authorized(id_tag):
                 # If the tag is in auth cache and valid, don't wait for authorization
                 self.__scheduler.add_job(self.__authorize_tag, 'date',
                                          run_date=(datetime.now() + timedelta(seconds=5)),
                                          args=[id_tag])
                 return True
-        elif is_remote_request and \
-                not self.__charging_configuration.get_configuration_variable_value("AuthorizeRemoteTx") == "true":
+        elif is_remote_request and not configuration.authorize_remote_tx_requests:
             return True
-        id_tag_info: dict = await self.__authorize_tag(id_tag)
+        try:
+            id_tag_info: dict = await self.__authorize_tag(id_tag)
+        except (asyncio.TimeoutError, ConnectionClosed) as ex:
+            logger.warning(f"Cannot authorize tag {id_tag} with the central system", exc_info=ex)
+            return await self.__is_tag_authorized_offline(id_tag)
         print(id_tag_info)
         return id_tag_info["status"] == enums.AuthorizationStatus.accepted
 
+    async def __is_tag_authorized_offline(self, id_tag: str) -> bool:
+        """
+        Authorize the tag with the Authorization Cache while the central system is unreachable.
+        Unknown tags are allowed only if AllowOfflineTxForUnknownId is enabled.
+        :param id_tag: Tag ID
+        :return: True or false
+        """
+        configuration: ConfigurationSnapshot = self.__charging_configuration.get_snapshot
+        if not configuration.local_authorize_offline:
+            return False
+        if await self.__authorization_cache.is_tag_authorized(id_tag):
+            return True
+        if self.__authorization_cache.is_tag_known(id_tag):
+            return False
+        return configuration.allow_offline_tx_for_unknown_id
+
+    def __on_tag_updated(self, id_tag: str, tag_info: dict):
+        """
+        Forget the rejected authorization of a tag when its tag info was updated with a status that isn't rejected.
+        :param id_tag: Tag ID
+        :param tag_info: New tag info, None if the tag was removed from the local list
+        :return:
+        """
+        if tag_info is None or not self.__authorize_requests.is_negative(tag_info):
+            self.__authorize_requests.forget(id_tag)
+
     async def __authorize_tag(self, id_tag: str):
+        """
+        Authorize the tag with the server. Concurrent authorizations of the same tag wait for the same request.
+        :param id_tag: Tag ID
+        :return: Tag info of the authentication response
+        """
+        return await self.__authorize_requests.run(id_tag, self.__send_authorize_request, id_tag)
+
+    async def __send_authorize_request(self, id_tag: str):
         """
         Authorize the tag with the server. If Authorization Cache is enabled, (re)write the tag info in the cache.
         :param id_tag: Tag ID
@@ -199,7 +251,7 @@ class ChargePointV16(cp):
         request = call.AuthorizePayload(id_tag=id_tag)
         auth_response = await self.call(request)
         tag_info: dict = auth_response.id_tag_info
-        if self.__charging_configuration.get_configuration_variable_value("AuthorizationCacheEnabled") == "true":
+        if self.__charging_configuration.get_snapshot.authorization_cache_enabled:
             self.__scheduler.add_job(self.__authorization_cache.update_tag_info,
                                      args=[id_tag, tag_info])
         if tag_info["status"] == enums.AuthorizationStatus.blocked:
@@ -212,12 +264,8 @@ class ChargePointV16(cp):
     async def indicate_card_read(self):
         print("Indicate card read")
         if self.hardware_info["LED_indicator"]["type"] == "WS281x":
-            colors = self._get_LED_colors()
-            for _ in range(2):
-                self._update_LED_status(f"{colors} {LEDStrip.WHITE}")
-                await asyncio.sleep(.3)
-                self._update_LED_status(f"{colors} {LEDStrip.OFF}")
-                await asyncio.sleep(.3)
+            if self._led_compositor is not None:
+                await self._led_compositor.play(len(self.get_connectors), "card", Blink(LEDStrip.WHITE))
             pass
         elif self.hardware_info["LED_indicator"]["type"] == "simple":
             pass
@@ -225,20 +273,35 @@ class ChargePointV16(cp):
     async def indicate_card_rejected(self):
         print("Indicate card rejected")
         if self.hardware_info["LED_indicator"]["type"] == "WS281x":
-            colors = self._get_LED_colors()
-            for _ in range(2):
-                self._update_LED_status(f"{colors} {LEDStrip.RED}")
-                await asyncio.sleep(.3)
-                self._update_LED_status(f"{colors} {LEDStrip.OFF}")
-                await asyncio.sleep(.3)
+            if self._led_compositor is not None:
+                await self._led_compositor.play(len(self.get_connectors), "card", Blink(LEDStrip.RED))
         elif self.hardware_info["LED_indicator"]["type"] == "simple":
             pass
 
-    def _get_LED_colors(self) -> str:
+    def _get_LED_compositor(self) -> LEDCompositor:
         """
-        Get the status of all the connectors and determine which color they should have. Return the colors as a string.
+        Set up the LED strip once, with an LED for each connector and one for indications,
+        and start composing its frames.
+        """
+        if self.hardware_info["LED_indicator"]["type"] == "WS281x":
+            try:
+                led_strip: LEDStripDriver = LEDStripDriver(
+                    len(self.get_connectors) + 1,
+                    invert=self.hardware_info["LED_indicator"].get("invert", False))
+            except Exception as ex:
+                logger.error("Could not set up the LED strip", exc_info=ex)
+                print(ex)
+                return None
+            led_compositor: LEDCompositor = LEDCompositor(led_strip, led_strip.led_count)
+            asyncio.ensure_future(led_compositor.run())
+            return led_compositor
+        return None
+
+    def _get_LED_colors(self) -> list:
         """
-        colors = ""
+        Get the status of all the connectors and determine which color they should have. Return the colors as a list.
+        """
+        colors: list = []
         for index, connector in enumerate(self.get_connectors):
             status_color = LEDStrip.RED
             if connector.is_available():
@@ -249,19 +312,27 @@ class ChargePointV16(cp):
                 status_color = LEDStrip.YELLOW
             elif connector.is_unavailable():
                 status_color = LEDStrip.ORANGE
-            colors += f" {status_color}"
+            colors.append(status_color)
         return colors
 
-    def _update_LED_status(self, colors: str):
+    def _update_LED_status(self, colors: list):
         """
         Update status of an LED of a connector
-        :param colors: Colors of the LEDs in a string
+        :param colors: Colors of the LEDs in a list
         :return:
         """
         if self.hardware_info["LED_indicator"]["type"] == "WS281x":
-            command = f"sudo python3 {_path}/../hardware/leds/LEDStrip.py{colors}"
-            print(command)
-            subprocess.Popen(command, shell=True)
+            if self._led_compositor is None:
+                return
+            self._led_compositor.set_base_colors(colors)
+            # Show the charging progress on top of the status color
+            for index, connector in enumerate(self.get_connectors):
+                if not connector.is_charging():
+                    self._led_compositor.remove_overlay(index, "charging")
+                elif not self._led_compositor.has_overlay(index, "charging"):
+                    self._led_compositor.set_overlay(index, "charging",
+                                                     Progress(LEDStrip.BLUE,
+                                                              lambda c=connector: c.get_charging_progress))
         elif self.hardware_info["LED_indicator"]["type"] == "simple":
             pass
 
@@ -310,6 +381,16 @@ class ChargePointV16(cp):
     async def __start_charging_connector_with_id(self, id_tag: str, connector_id: int,
                                                  is_remote_request: bool = False, retry_attempt: int = 0) -> str:
         """
+        Start the charging process on a specific connector. The refresh of the cached tags waits
+        until the transaction started.
+        :return: Response
+        """
+        with self.__tag_revalidator.paused():
+            return await self.__start_transaction(id_tag, connector_id, is_remote_request, retry_attempt)
+
+    async def __start_transaction(self, id_tag: str, connector_id: int,
+                                  is_remote_request: bool = False, retry_attempt: int = 0) -> str:
+        """
         Start the charging process on a specific connector. Charging starts with checking the card
         authorization in the cache and/or server, then sending a transaction request.
         If all goes well, allow the hardware to start charging.
@@ -330,21 +411,19 @@ class ChargePointV16(cp):
                                                 err_code=error_code.noError,
                                                 connector_status=status.preparing)
             request = call.StartTransactionPayload(timestamp=datetime.utcnow().isoformat(),
-                                                   meter_start=0,
+                                                   meter_start=int(connector.get_energy_register),
                                                    id_tag=id_tag,
                                                    connector_id=connector_id)
             server_response = await self.call(request)
             tag_info = server_response.id_tag_info
             # If the server accepts, start charging
             if tag_info["status"] == enums.RemoteStartStopStatus.accepted or tag_info["status"] == "ConcurrentTx":
-                connector_response = connector.start_charging(transaction_id=str(server_response.transaction_id),
-                                                              id_tag=id_tag,
-                                                              meter_sample_time=int(
-                                                                  self.__charging_configuration.get_configuration_variable_value(
-                                                                      "MeterValueSampleInterval")),
-                                                              connector_timeout=int(
-                                                                  self.__charging_configuration.get_configuration_variable_value(
-                                                                      "ConnectionTimeOut")))
+                configuration: ConfigurationSnapshot = self.__charging_configuration.get_snapshot
+                connector_response = connector.start_charging(
+                    transaction_id=str(server_response.transaction_id),
+                    id_tag=id_tag,
+                    meter_sample_time=configuration.meter_value_sample_interval,
+                    connector_timeout=configuration.connection_timeout)
                 if connector_response == s_responses.SessionStartSuccess:
                     start_charging_log: str = f"Started charging at connector {connector_id}"
                     print(start_charging_log)
@@ -390,8 +469,7 @@ class ChargePointV16(cp):
                 ev_disconnected_str: str = f"Connector {connector_id} disconnected from EV"
                 print(ev_disconnected_str)
                 logger.debug(ev_disconnected_str)
-                if self.__charging_configuration.get_configuration_variable_value(
-                        "StopTransactionOnEVSideDisconnect") == "false":
+                if not self.__charging_configuration.get_snapshot.stop_transaction_on_ev_side_disconnect:
                     connector.stop_charging()
                     await self._update_status_at_stoppage(connector_id=connector_id, reason=stop_reason)
                     return responses.StopChargingSuccess
@@ -399,16 +477,8 @@ class ChargePointV16(cp):
             if id_tag != "" and id_tag != connector.get_current_tag_id:
                 if not await self.__is_tag_authorized(id_tag=id_tag, is_remote_request=is_remote_request):
                     return responses.UnauthorizedCard
-            energy_consumed: int = 0
-            if connector.get_avg_power > 0:
-                try:
-                    charging_time_seconds = (
-                            datetime.now() - datetime.fromisoformat(connector.get_session_started)).total_seconds()
-                    energy_consumed = int(connector.get_avg_power * charging_time_seconds)
-                except Exception:
-                    pass
             request = call.StopTransactionPayload(transaction_id=int(connector.get_current_transaction_id),
-                                                  meter_stop=energy_consumed,
+                                                  meter_stop=int(connector.get_energy_register),
                                                   id_tag=id_tag,
                                                   timestamp=datetime.utcnow().isoformat(),
                                                   reason=stop_reason)
@@ -471,13 +541,10 @@ class ChargePointV16(cp):
                                                 err_code=enums.ChargePointErrorCode.noError)
             if previous_status == status.charging:
                 # Try to resume charging & notify about success
+                configuration: ConfigurationSnapshot = self.__charging_configuration.get_snapshot
                 response = connector.resume_charging(session_info=session_info,
-                                                     meter_sample_time=int(
-                                                         self.__charging_configuration.get_configuration_variable_value(
-                                                             "MeterValueSampleInterval")),
-                                                     connector_timeout=int(
-                                                         self.__charging_configuration.get_configuration_variable_value(
-                                                             "ConnectionTimeOut")))
+                                                     meter_sample_time=configuration.meter_value_sample_interval,
+                                                     connector_timeout=configuration.connection_timeout)
                 logger.debug(f"Restoring to charging state at connector {connector.connector_id} returned {response}")
                 if response == s_responses.SessionResumeSuccess:
                     await self._change_connector_status(connector_id=connector_id,
@@ -513,14 +580,11 @@ class ChargePointV16(cp):
             send_meter_values_str: str = f"Sending values to the central system at connector {connector_id}"
             logger.debug(send_meter_values_str)
             print(send_meter_values_str)
+            measurands: list = self.__charging_configuration.get_snapshot.meter_values_sampled_data
             for sample in samples:
-                for value in sample:
-                    if float(value["sampled_value"]["value"]) < float(self.hardware_info["min_power"]):
-                        samples.remove(sample)
-                        continue
-                    value["sampled_value"][
-                        "measurand"] = self.__charging_configuration.get_configuration_variable_value(
-                        "MeterValuesSampledData")
+                for sampled_value in sample["sampled_value"]:
+                    if "measurand" not in sampled_value.keys() and len(measurands) > 0:
+                        sampled_value["measurand"] = measurands[0]
             request = call.MeterValuesPayload(meter_value=samples,
                                               transaction_id=int(connector.get_current_transaction_id),
                                               connector_id=connector_id)
@@ -622,15 +686,16 @@ class ChargePointV16(cp):
             print(msg)
             logger.debug(msg, exc_info=ex)
         finally:
+            ConnectorSettingsManager.flush_sync()
+            self.__authorization_cache.flush_sync()
             self.__scheduler.shutdown(wait=False)
             self._clear_leds()
 
     def _clear_leds(self):
         # Clear all LEDs
-        leds = ""
-        for _ in range(len(self.get_connectors)):
-            leds += " 0"
-        subprocess.Popen(f"sudo python3 {_path}/../hardware/leds/LEDStrip.py{leds}", shell=True)
+        if self._led_compositor is not None:
+            self._led_compositor.stop()
+            self._led_compositor.clear()
 
     async def heartbeat(self):
         """
@@ -846,6 +911,15 @@ class ChargePointV16(cp):
             response = await self.__charging_configuration.update_configuration_variable(key=key, value=value)
             logger.info(f"Change configuration response {response}")
             if response == "Success":
+                if key == "LocalAuthListMaxLength":
+                    self.__authorization_cache.set_max_local_tags(
+                        self.__charging_configuration.get_snapshot.local_auth_list_max_length)
+                elif key == "AuthorizationCacheEnabled":
+                    self.__authorization_cache.set_cache_supported(
+                        self.__charging_configuration.get_snapshot.authorization_cache_enabled)
+                elif key == "LocalAuthListEnabled":
+                    self.__authorization_cache.set_local_list_supported(
+                        self.__charging_configuration.get_snapshot.local_auth_list_enabled)
                 return call_result.ChangeConfigurationPayload(enums.ConfigurationStatus.accepted)
             else:
                 return call_result.ChangeConfigurationPayload(enums.ConfigurationStatus.rejected)
@@ -879,13 +953,16 @@ class ChargePointV16(cp):
         :param local_authorization_list:
         :return:
         """
-        if self.__authorization_cache.get_version != list_version:
-            return call_result.SendLocalListPayload(enums.UpdateStatus.versionMismatch)
+        if update_type == enums.UpdateType.differential and list_version <= self.__authorization_cache.get_version:
+            return call_result.SendLocalListPayload(enums.UpdateStatus.version_mismatch)
         elif update_type == enums.UpdateType.differential or update_type == enums.UpdateType.full:
-            await self.__authorization_cache.update_cached_tags(local_authorization_list)
-            return call_result.SendLocalListPayload(enums.UpdateStatus.accepted)
+            if await self.__authorization_cache.update_cached_tags(
+                    local_authorization_list, list_version=list_version,
+                    is_full_update=update_type == enums.UpdateType.full) == AuthCache.ListUpdateSuccess:
+                return call_result.SendLocalListPayload(enums.UpdateStatus.accepted)
+            return call_result.SendLocalListPayload(enums.UpdateStatus.failed)
         else:
-            return call_result.SendLocalListPayload(enums.UpdateStatus.notSupported)
+            return call_result.SendLocalListPayload(enums.UpdateStatus.not_supported)
 
     def __soft_reset(self):
         self.cleanup(reason=reason.softReset)
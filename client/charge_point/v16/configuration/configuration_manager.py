@@ -2,10 +2,95 @@ import json
 import logging
 from aiofiles import open as asyncopen
 import os
+from ocpp.v16.enums import Measurand
 
 logger = logging.getLogger('chargepi_logger')
 
 
+class ConfigurationSnapshot:
+    """
+    Typed values of the configuration, parsed once when the configuration is loaded or changed.
+    A new snapshot replaces the old one on every change, so a reference to a snapshot stays consistent.
+    """
+
+    __slots__ = ("allow_offline_tx_for_unknown_id", "authorization_cache_enabled", "authorize_remote_tx_requests",
+                 "local_auth_list_enabled", "local_authorize_offline", "local_pre_authorize",
+                 "reserve_connector_zero_supported", "stop_transaction_on_ev_side_disconnect",
+                 "unlock_connector_on_ev_side_disconnect", "transaction_message_attempts",
+                 "transaction_message_retry_interval", "send_local_list_max_length", "local_auth_list_max_length",
+                 "reset_retries", "number_of_connectors", "meter_value_sample_interval",
+                 "clock_aligned_data_interval", "connection_timeout", "get_configuration_max_keys",
+                 "heartbeat_interval", "supported_feature_profiles", "meter_values_sampled_data",
+                 "meter_values_aligned_data", "stop_txn_aligned_data")
+
+    def __init__(self, configuration: dict):
+        """
+        :param configuration: Key -> {"readOnly": bool, "value": str}
+        """
+        self.allow_offline_tx_for_unknown_id: bool = self.__bool(configuration, "AllowOfflineTxForUnknownId")
+        self.authorization_cache_enabled: bool = self.__bool(configuration, "AuthorizationCacheEnabled")
+        self.authorize_remote_tx_requests: bool = self.__bool(configuration, "AuthorizeRemoteTxRequests")
+        self.local_auth_list_enabled: bool = self.__bool(configuration, "LocalAuthListEnabled")
+        self.local_authorize_offline: bool = self.__bool(configuration, "LocalAuthorizeOffline")
+        self.local_pre_authorize: bool = self.__bool(configuration, "LocalPreAuthorize")
+        self.reserve_connector_zero_supported: bool = self.__bool(configuration, "ReserveConnectorZeroSupported")
+        self.stop_transaction_on_ev_side_disconnect: bool = self.__bool(configuration,
+                                                                        "StopTransactionOnEVSideDisconnect")
+        self.unlock_connector_on_ev_side_disconnect: bool = self.__bool(configuration,
+                                                                        "UnlockConnectorOnEVSideDisconnect")
+        self.transaction_message_attempts: int = self.__int(configuration, "TransactionMessageAttempts", 3)
+        self.transaction_message_retry_interval: int = self.__int(configuration, "TransactionMessageRetryInterval",
+                                                                  60)
+        self.send_local_list_max_length: int = self.__int(configuration, "SendLocalListMaxLength", 20)
+        self.local_auth_list_max_length: int = self.__int(configuration, "LocalAuthListMaxLength", 20)
+        self.reset_retries: int = self.__int(configuration, "ResetRetries", 3)
+        self.number_of_connectors: int = self.__int(configuration, "NumberOfConnectors", 1)
+        self.meter_value_sample_interval: int = self.__int(configuration, "MeterValueSampleInterval", 60)
+        self.clock_aligned_data_interval: int = self.__int(configuration, "ClockAlignedDataInterval", 0)
+        self.connection_timeout: int = self.__int(configuration, "ConnectionTimeOut", 50)
+        self.get_configuration_max_keys: int = self.__int(configuration, "GetConfigurationMaxKeys", 30)
+        self.heartbeat_interval: int = self.__int(configuration, "HeartbeatInterval", 60)
+        self.supported_feature_profiles: list = self.__list(configuration, "SupportedFeatureProfiles")
+        self.meter_values_sampled_data: list = self.__measurands(configuration, "MeterValuesSampledData")
+        self.meter_values_aligned_data: list = self.__measurands(configuration, "MeterValuesAlignedData")
+        self.stop_txn_aligned_data: list = self.__measurands(configuration, "StopTxnAlignedData")
+
+    @staticmethod
+    def __value(configuration: dict, key: str) -> str:
+        attribute: dict = configuration.get(key)
+        if not isinstance(attribute, dict):
+            return ""
+        return str(attribute.get("value", "")).strip()
+
+    @staticmethod
+    def __bool(configuration: dict, key: str) -> bool:
+        return ConfigurationSnapshot.__value(configuration, key).lower() == "true"
+
+    @staticmethod
+    def __int(configuration: dict, key: str, default: int) -> int:
+        value: str = ConfigurationSnapshot.__value(configuration, key)
+        try:
+            return int(value)
+        except ValueError:
+            logger.warning(f"Invalid value {value!r} of {key}, using {default}")
+            return default
+
+    @staticmethod
+    def __list(configuration: dict, key: str) -> list:
+        return [item.strip() for item in ConfigurationSnapshot.__value(configuration, key).split(",")
+                if item.strip() != ""]
+
+    @staticmethod
+    def __measurands(configuration: dict, key: str) -> list:
+        measurands: list = []
+        for item in ConfigurationSnapshot.__list(configuration, key):
+            try:
+                measurands.append(Measurand(item))
+            except ValueError:
+                logger.warning(f"Ignoring unknown measurand {item!r} of {key}")
+        return measurands
+
+
 class ConfigurationManager:
     """
     Class for I/O operations of charge point configuration.
@@ -17,12 +102,17 @@ class ConfigurationManager:
     def __init__(self):
         self.__configuration: dict = dict()
         self.__version: int = None
+        self.__snapshot: ConfigurationSnapshot = None
         self.get_configuration_from_file()
 
     @property
     def get_configuration(self) -> dict:
         return self.__configuration
 
+    @property
+    def get_snapshot(self) -> ConfigurationSnapshot:
+        return self.__snapshot
+
     def get_configuration_variable_value(self, key) -> str:
         if key in self.__configuration.keys():
             return self.__configuration[key]["value"]
@@ -61,6 +151,8 @@ class ConfigurationManager:
                 "AllowOfflineTxForUnknownId"]
             self.__configuration["AuthorizationCacheEnabled"] = attribute_data["configuration"][
                 "AuthorizationCacheEnabled"]
+            self.__configuration["AuthorizeRemoteTxRequests"] = attribute_data["configuration"][
+                "AuthorizeRemoteTxRequests"]
             self.__configuration["TransactionMessageAttempts"] = attribute_data["configuration"][
                 "TransactionMessageAttempts"]
             self.__configuration["TransactionMessageRetryInterval"] = attribute_data["configuration"][
@@ -94,6 +186,7 @@ class ConfigurationManager:
             self.__configuration["LocalAuthorizeOffline"] = attribute_data["configuration"]["LocalAuthorizeOffline"]
             self.__configuration["LocalPreAuthorize"] = attribute_data["configuration"]["LocalPreAuthorize"]
             self.__configuration["MeterValuesAlignedData"] = attribute_data["configuration"]["MeterValuesAlignedData"]
+            self.__snapshot = ConfigurationSnapshot(self.__configuration)
 
     def get_configuration_from_file(self):
         with open(ConfigurationManager.__file_name, mode="r") as config_file:
@@ -104,6 +197,8 @@ class ConfigurationManager:
                 "AllowOfflineTxForUnknownId"]
             self.__configuration["AuthorizationCacheEnabled"] = attribute_data["configuration"][
                 "AuthorizationCacheEnabled"]
+            self.__configuration["AuthorizeRemoteTxRequests"] = attribute_data["configuration"][
+                "AuthorizeRemoteTxRequests"]
             self.__configuration["TransactionMessageAttempts"] = attribute_data["configuration"][
                 "TransactionMessageAttempts"]
             self.__configuration["TransactionMessageRetryInterval"] = attribute_data["configuration"][
@@ -137,3 +232,4 @@ class ConfigurationManager:
             self.__configuration["LocalAuthorizeOffline"] = attribute_data["configuration"]["LocalAuthorizeOffline"]
             self.__configuration["LocalPreAuthorize"] = attribute_data["configuration"]["LocalPreAuthorize"]
             self.__configuration["MeterValuesAlignedData"] = attribute_data["configuration"]["MeterValuesAlignedData"]
+            self.__snapshot = ConfigurationSnapshot(self.__configuration)
@@ -1,6 +1,5 @@
 import asyncio
 import ocpp.v201.enums as enums
-import subprocess
 import wget
 from ocpp.v201.enums import ReasonType as ReasonType
 from ocpp.v201 import call, call_result
@@ -15,12 +14,17 @@ import os, sys
 import charge_point.responses as responses
 from datetime import datetime, timedelta
 from charge_point.connectors.ChargingConnector import ConnectorSettingsManager
+from charge_point.connectors.registry import ConnectorRegistry
 from charge_point.data.update_manager import get_next_version, update_target_version, perform_update
 from charge_point.hardware.components import LEDStrip
+from charge_point.hardware.leds.LEDStrip import LEDStripDriver
+from charge_point.hardware.leds.compositor import LEDCompositor, Blink, Progress
 from charge_point.scheduler import SchedulerManager
 from charge_point.v201.configuration import configuration_manager
 from charge_point.v201.connector_v201 import ConnectorV201
 from charge_point.data.auth.authorization_cache import AuthorizationCache as AuthCache
+from charge_point.data.auth.single_flight import SingleFlight
+from charge_point.data.auth.revalidator import TagRevalidator
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from string_utils import is_full_string
 
@@ -44,7 +48,8 @@ class ChargePointV201(cp201):
         else:
             raise Exception("Not initialized")
 
-    def __init__(self, id, connection, charge_point_info, hardware_info: dict, response_timeout=30):
+    def __init__(self, id, connection, charge_point_info, hardware_info: dict, response_timeout=30,
+                 authorization_cache: AuthCache = None):
         if ChargePointV201.__instance is not None:
             return
         self.__charging_configuration = configuration_manager
@@ -58,9 +63,25 @@ class ChargePointV201(cp201):
         self.__is_available: bool = True
         self.charge_point_info: dict = charge_point_info
         self.hardware_info: dict = hardware_info
-        self._ChargePointConnectors: list = list()
-        self.__authorization_cache: AuthCache = AuthCache(self.__charging_configuration.auth_cache_ctrlr.is_enabled)
-        self.__authorization_cache.set_max_cached_tags(self.__charging_configuration.local_auth_list_ctrlr)
+        self._connector_registry: ConnectorRegistry = ConnectorRegistry()
+        # The cache is loaded at boot, so the tags can be authorized before the connection is established
+        if authorization_cache is None:
+            authorization_cache = AuthCache()
+        self.__authorization_cache: AuthCache = authorization_cache
+        self.__authorization_cache.set_cache_supported(self.__charging_configuration.auth_cache_ctrlr.is_enabled)
+        self.__authorization_cache.set_local_list_supported(
+            self.__charging_configuration.local_auth_list_ctrlr.is_enabled)
+        self.__authorization_cache.set_max_local_tags(self.__charging_configuration.local_auth_list_ctrlr.Entries)
+        # Concurrent authorizations of a tag share one request, rejected tags are not sent again for a while
+        self.__authorize_requests: SingleFlight = SingleFlight(
+            is_negative=lambda tag_info: tag_info["status"] in (enums.AuthorizationStatusType.blocked,
+                                                                enums.AuthorizationStatusType.expired,
+                                                                enums.AuthorizationStatusType.invalid))
+        # A rejected tag is not rejected from memory anymore once the local list or the cache accepts it
+        self.__authorization_cache.set_tag_listener(self.__on_tag_updated)
+        # Refresh the cached tags nearing expiry in the background
+        self.__tag_revalidator: TagRevalidator = TagRevalidator(self.__authorization_cache, self.__authorize_tag)
+        self.__scheduler.add_job(self.__tag_revalidator.run_once, 'interval', seconds=60, max_instances=1)
         # Add all the connectors specified in the connectors.json
         for evse in ConnectorSettingsManager.get_evses():
             for connector in ConnectorSettingsManager.get_connectors_from_evse(evse["id"]):
@@ -71,11 +92,9 @@ class ChargePointV201(cp201):
                                      connector_type=connector["type"],
                                      relay_settings=relay_settings,
                                      power_meter_settings=power_meter_settings)
-        # Sort by EVSE ID for performance
-        self._ChargePointConnectors.sort(key=(lambda conn: conn.evse_id))
         # Display the status of each connector
-        for connector in self.get_connectors:
-            self._update_LED_status(connector)
+        self._led_compositor: LEDCompositor = self._get_LED_compositor()
+        self._update_LED_status(self._get_LED_colors())
 
     def __add_connector(self, evse_id: int, connector_id: int, connector_type: str, power_meter_settings: dict,
                         relay_settings: dict):
@@ -86,8 +105,8 @@ class ChargePointV201(cp201):
         :return:
         """
         if self.__find_connector_with_id(evse_id, connector_id) is None and connector_id > 0:
-            list_length: int = len(self._ChargePointConnectors)
-            if list_length != 0 and connector_id != self._ChargePointConnectors[list_length - 1].connector_id + 1:
+            evse_connectors: list = self.__get_connectors_from_evse(evse_id)
+            if len(evse_connectors) != 0 and connector_id != evse_connectors[-1].connector_id + 1:
                 return
             connector: ConnectorV201 = ConnectorV201(evse_id=evse_id,
                                                      connector_id=connector_id,
@@ -101,12 +120,16 @@ class ChargePointV201(cp201):
                                                      power_meter_shunt_offset=int(power_meter_settings["shunt_offset"]),
                                                      max_charging_time=self.charge_point_info["max_charging_time"],
                                                      stop_transaction_function=self.__stop_charging_connector_with_id,
-                                                     send_meter_values_function=self.send_meter_values)
-            self._ChargePointConnectors.append(connector)
+                                                     send_meter_values_function=self.send_meter_values,
+                                                     power_meter_interrupt_pin=int(
+                                                         power_meter_settings.get("interrupt_pin", 0)),
+                                                     power_meter_energy_register=bool(
+                                                         power_meter_settings.get("energy_register", True)))
+            self._connector_registry.add(connector)
 
     @property
     def get_connectors(self) -> list:
-        return self._ChargePointConnectors
+        return self._connector_registry.get_connectors
 
     @property
     def is_available(self) -> bool:
@@ -128,7 +151,7 @@ class ChargePointV201(cp201):
         Find all connectors which are currently charging.
         :return: List of connectors.
         """
-        return [(connector for connector in self.get_connectors if connector.is_charging())]
+        return self._connector_registry.get_charging()
 
     def __find_available_connector(self) -> ConnectorV201:
         """
@@ -163,15 +186,14 @@ class ChargePointV201(cp201):
         :param connector_id: A connector ID
         :return: A connector
         """
-        return next((connector for connector in self.get_connectors
-                     if connector.evse_id == evse_id and connector.connector_id == connector_id), None)
+        return self._connector_registry.get(evse_id, connector_id)
 
     def __get_connectors_from_evse(self, evse_id: int) -> list:
         """
         Get connectors from an EVSE.
         :return: A connector
         """
-        return [connector for connector in self.get_connectors if connector.evse_id == evse_id]
+        return self._connector_registry.get_evse_connectors(evse_id)
 
     def __is_connector_permitted_to_charge(self, connector: ConnectorV201) -> bool:
         """
@@ -190,8 +212,7 @@ class ChargePointV201(cp201):
         :param transaction_id: A transaction ID
         :return: A connector
         """
-        return next((connector for connector in self.get_connectors
-                     if connector.get_current_transaction_id == transaction_id), None)
+        return self._connector_registry.find_with_transaction_id(transaction_id)
 
     def __find_connector_with_tag_id(self, id_tag: str) -> ConnectorV201:
         """
@@ -199,8 +220,7 @@ class ChargePointV201(cp201):
         :param id_tag: A RFID ID
         :return: A connector
         """
-        return next((connector for connector in self.get_connectors
-                     if connector.get_tag_id() == id_tag), None)
+        return self._connector_registry.find_with_tag_id(id_tag)
 
     async def __is_tag_authorized(self, id_tag: str, is_remote_request: bool) -> bool:
         """
@@ -222,7 +242,25 @@ class ChargePointV201(cp201):
             print(id_tag_info)
             return id_tag_info["status"] == enums.AuthorizationStatusType.accepted
 
+    def __on_tag_updated(self, id_tag: str, tag_info: dict):
+        """
+        Forget the rejected authorization of a tag when its tag info was updated with a status that isn't rejected.
+        :param id_tag: Tag ID
+        :param tag_info: New tag info, None if the tag was removed from the local list
+        :return:
+        """
+        if tag_info is None or not self.__authorize_requests.is_negative(tag_info):
+            self.__authorize_requests.forget(id_tag)
+
     async def __authorize_tag(self, id_tag: str):
+        """
+        Authorize the tag with the server. Concurrent authorizations of the same tag wait for the same request.
+        :param id_tag: Tag ID
+        :return: Tag info of the authentication response
+        """
+        return await self.__authorize_requests.run(id_tag, self.__send_authorize_request, id_tag)
+
+    async def __send_authorize_request(self, id_tag: str):
         """
         Authorize the RFID card with the server. If Authorization Cache is enabled, (re)write the tag info in the cache.
         :param id_tag: Tag ID
@@ -244,12 +282,8 @@ class ChargePointV201(cp201):
     async def indicate_card_read(self):
         print("Indicate card read")
         if self.hardware_info["LED_indicator"]["type"] == "WS281x":
-            colors = self._get_LED_colors()
-            for _ in range(2):
-                self._update_LED_status(f"{colors} {LEDStrip.WHITE}")
-                await asyncio.sleep(.3)
-                self._update_LED_status(f"{colors} {LEDStrip.OFF}")
-                await asyncio.sleep(.3)
+            if self._led_compositor is not None:
+                await self._led_compositor.play(len(self.get_connectors), "card", Blink(LEDStrip.WHITE))
             pass
         elif self.hardware_info["LED_indicator"]["type"] == "simple":
             pass
@@ -257,17 +291,32 @@ class ChargePointV201(cp201):
     async def indicate_card_rejected(self):
         print("Indicate card rejected")
         if self.hardware_info["LED_indicator"]["type"] == "WS281x":
-            colors = self._get_LED_colors()
-            for _ in range(2):
-                self._update_LED_status(f"{colors} {LEDStrip.RED}")
-                await asyncio.sleep(.3)
-                self._update_LED_status(f"{colors} {LEDStrip.OFF}")
-                await asyncio.sleep(.3)
+            if self._led_compositor is not None:
+                await self._led_compositor.play(len(self.get_connectors), "card", Blink(LEDStrip.RED))
         elif self.hardware_info["LED_indicator"]["type"] == "simple":
             pass
 
-    def _get_LED_colors(self) -> str:
-        colors = ""
+    def _get_LED_compositor(self) -> LEDCompositor:
+        """
+        Set up the LED strip once, with an LED for each connector and one for indications,
+        and start composing its frames.
+        """
+        if self.hardware_info["LED_indicator"]["type"] == "WS281x":
+            try:
+                led_strip: LEDStripDriver = LEDStripDriver(
+                    len(self.get_connectors) + 1,
+                    invert=self.hardware_info["LED_indicator"].get("invert", False))
+            except Exception as ex:
+                logger.error("Could not set up the LED strip", exc_info=ex)
+                print(ex)
+                return None
+            led_compositor: LEDCompositor = LEDCompositor(led_strip, led_strip.led_count)
+            asyncio.ensure_future(led_compositor.run())
+            return led_compositor
+        return None
+
+    def _get_LED_colors(self) -> list:
+        colors: list = []
         for index, connector in enumerate(self.get_connectors):
             status_color = LEDStrip.RED
             if connector.is_available():
@@ -278,18 +327,26 @@ class ChargePointV201(cp201):
                 status_color = LEDStrip.YELLOW
             elif connector.is_unavailable():
                 status_color = LEDStrip.ORANGE
-            colors += f" {status_color}"
+            colors.append(status_color)
         return colors
 
-    def _update_LED_status(self, colors: str):
+    def _update_LED_status(self, colors: list):
         """
         Update status of an LED of a connector
         :return:
         """
         if self.hardware_info["LED_indicator"]["type"] == "WS281x":
-            command = f"sudo python3 {_path}/../hardware/leds/LEDStrip.py {colors}"
-            print(command)
-            subprocess.Popen(command, shell=True)
+            if self._led_compositor is None:
+                return
+            self._led_compositor.set_base_colors(colors)
+            # Show the charging progress on top of the status color
+            for index, connector in enumerate(self.get_connectors):
+                if not connector.is_charging():
+                    self._led_compositor.remove_overlay(index, "charging")
+                elif not self._led_compositor.has_overlay(index, "charging"):
+                    self._led_compositor.set_overlay(index, "charging",
+                                                     Progress(LEDStrip.BLUE,
+                                                              lambda c=connector: c.get_charging_progress))
         elif self.hardware_info["LED_indicator"]["type"] == "simple":
             pass
 
@@ -335,6 +392,16 @@ class ChargePointV201(cp201):
     async def __start_charging_connector_with_id(self, id_tag: str, evse_id: int, connector_id: int,
                                                  is_remote_request: bool = False, retry_attempt: int = 0) -> str:
         """
+        Start the charging process on a specific connector. The refresh of the cached tags waits
+        until the transaction started.
+        :return: Response
+        """
+        with self.__tag_revalidator.paused():
+            return await self.__start_transaction(id_tag, evse_id, connector_id, is_remote_request, retry_attempt)
+
+    async def __start_transaction(self, id_tag: str, evse_id: int, connector_id: int,
+                                  is_remote_request: bool = False, retry_attempt: int = 0) -> str:
+        """
         Start the charging process on a specific connector. Charging starts with checking the card
         authorization in the cache and/or server, then sending a transaction request.
          If all goes well, enable the hardware to charge.
@@ -457,7 +524,7 @@ class ChargePointV201(cp201):
 
     async def restore_state(self):
         # Restore state from connectors.json file
-        for connector in self._ChargePointConnectors:
+        for connector in self.get_connectors:
             connector_id: int = connector.connector_id
             evse_id: int = connector.evse_id
             previous_status, session_info = ConnectorSettingsManager.get_connector_status(evse_id, connector_id)
@@ -507,13 +574,14 @@ class ChargePointV201(cp201):
                 trigger_reason=event_trigger,
                 evse={"id": evse_id, "connectorId": connector_id},
                 meter_value=[{"timestamp": datetime.now().isoformat(),
-                              "sampledValue": {"value": connector.get_energy_consumption,
-                                               "context": enums.ReadingContextType.sample_periodic}
+                              "sampledValue": {"value": connector.get_energy_register,
+                                               "context": enums.ReadingContextType.sample_periodic,
+                                               "measurand": enums.MeasurandType.energy_active_import_register}
                               }],
                 transaction_info={"transactionId": connector.get_current_transaction_id},
                 timestamp=datetime.now().isoformat())
             logger.info("Sent meter value")
-            print("Sent meter value: {power_value}".format(power_value=connector.get_energy_consumption))
+            print("Sent meter value: {power_value}".format(power_value=connector.get_energy_register))
             await self.call(request)
 
     async def change_connector_status(self, evse_id: int, connector_id: int,
@@ -561,7 +629,7 @@ class ChargePointV201(cp201):
                                          id=job_id)
                 print(job_id)
             # Save status of each connector
-            for connector in self._ChargePointConnectors:
+            for connector in self.get_connectors:
                 connector.save_status_at_cleanup()
             # Wait for all jobs to be complete
             while len(self.__scheduler.get_jobs()) != 0:
@@ -573,10 +641,11 @@ class ChargePointV201(cp201):
             print(msg)
             logger.debug(msg, exc_info=ex)
         finally:
-            leds = ""
-            for _ in range(len(self.get_connectors)):
-                leds += " 0"
-            subprocess.Popen(f"sudo python3 {_path}/../hardware/leds/LEDStrip.py{leds}", shell=True)
+            ConnectorSettingsManager.flush_sync()
+            self.__authorization_cache.flush_sync()
+            if self._led_compositor is not None:
+                self._led_compositor.stop()
+                self._led_compositor.clear()
             self.__scheduler.shutdown(wait=False)
 
     async def heartbeat(self):
@@ -879,16 +948,20 @@ class ChargePointV201(cp201):
             return call_result.ClearCachePayload(enums.ClearCacheStatusType.rejected)
 
     @on(action.SendLocalList)
-    async def get_list(self, list_version: int, update_type: enums.UpdateType, local_authorization_list: list):
-        if self.__authorization_cache.get_version != list_version:
-            return call_result.SendLocalListPayload(enums.UpdateType.versionMismatch)
-        elif update_type == enums.UpdateType.full:
-            await self.__authorization_cache.update_cached_tags(local_authorization_list)
-            return call_result.SendLocalListPayload(enums.UpdateType.accepted)
-        elif update_type == enums.UpdateType.differential:
-            return call_result.SendLocalListPayload(enums.UpdateType.accepted)
+    async def get_list(self, version_number: int, update_type: enums.UpdateType,
+                       local_authorization_list: list = None):
+        if local_authorization_list is None:
+            local_authorization_list = []
+        if update_type == enums.UpdateType.differential and version_number <= self.__authorization_cache.get_version:
+            return call_result.SendLocalListPayload(enums.SendLocalListStatusType.version_mismatch)
+        elif update_type == enums.UpdateType.differential or update_type == enums.UpdateType.full:
+            if await self.__authorization_cache.update_cached_tags(
+                    local_authorization_list, list_version=version_number,
+                    is_full_update=update_type == enums.UpdateType.full) == AuthCache.ListUpdateSuccess:
+                return call_result.SendLocalListPayload(enums.SendLocalListStatusType.accepted)
+            return call_result.SendLocalListPayload(enums.SendLocalListStatusType.failed)
         else:
-            return call_result.SendLocalListPayload(enums.UpdateType.notSupported)
+            return call_result.SendLocalListPayload(enums.SendLocalListStatusType.failed)
 
     @on(action.DataTransfer)
     async def transfer_data(self, vendor_id: str, message_id: str, data: str):
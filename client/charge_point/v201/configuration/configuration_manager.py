@@ -98,6 +98,7 @@ class LocalAuthListCtrlr(Controller):
 
     def __init__(self, configuration: dict):
         super().__init__("LocalAuthListCtrlr", configuration)
+        self.Entries: int = int(self.get_attribute("Entries") or 0)
 
 
 class MonitoringCtrlr(Controller):
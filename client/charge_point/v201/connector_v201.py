@@ -22,10 +22,12 @@ class ConnectorV201(ChargingConnector):
                  power_meter_pin: int, power_meter_bus: int, power_meter_shunt_offset: float,
                  power_meter_voltage_divider_offset: float, power_meter_min_power: float,
                  max_charging_time: int,
-                 stop_transaction_function, send_meter_values_function):
+                 stop_transaction_function, send_meter_values_function,
+                 power_meter_interrupt_pin: int = 0, power_meter_energy_register: bool = True):
         super().__init__(evse_id, connector_id, conn_type, relay_pin, relay_state, power_meter_pin, power_meter_bus,
                          power_meter_shunt_offset, power_meter_voltage_divider_offset, power_meter_min_power,
-                         max_charging_time, stop_transaction_function, send_meter_values_function)
+                         max_charging_time, stop_transaction_function, send_meter_values_function,
+                         power_meter_interrupt_pin, power_meter_energy_register)
         self.set_status(ConnectorStatusType.available)
 
     def start_charging(self, id_tag: str, transaction_id: str = "", meter_sample_time: int = 60,
@@ -37,52 +39,40 @@ class ConnectorV201(ChargingConnector):
             except Exception as ex:
                 logger.debug(f"Cancelling reservation schedule failed at {connector_id}", exc_info=ex)
                 print(ex)
-                response = self._ChargingSession.start_charging_session(id_tag, str(uuid.uuid4()))
+                response = self._ChargingSession.start_charging_session(id_tag, str(uuid.uuid4()),
+                                                                        sample_window=meter_sample_time)
                 if response == SessionResponses.SessionStartSuccess:
+                    self._notify_session_started()
+                    self._open_meter_journal()
                     self._relay.on()
-                self._power_meter.reset()
-                self.__set_watchdogs(meter_sample_time=meter_sample_time,
-                                     connector_timeout=connector_timeout)
-                self._charging_scheduler.add_job(ConnectorSettingsManager.update_session,
-                                                 args=[self.evse_id, self.connector_id,
-                                                       {
-                                                           "is_active": True,
-                                                           "transaction_id": self.get_current_transaction_id,
-                                                           "tag_id": self.get_current_tag_id,
-                                                           "started": datetime.now().isoformat()
-                                                       }])
+                if isinstance(self._power_meter, PowerMeter):
+                    self._charging_scheduler.add_job(self._reset_power_meter)
+                self._set_watchdogs(meter_sample_time=meter_sample_time,
+                                    connector_timeout=connector_timeout,
+                                    max_charging_time=self._max_charging_time)
+                self._charging_scheduler.add_job(ConnectorSettingsManager.apply_changes,
+                                                 args=[[{"evse_id": self.evse_id,
+                                                         "connector_id": self.connector_id,
+                                                         "session": {
+                                                             "is_active": True,
+                                                             "transaction_id": self.get_current_transaction_id,
+                                                             "tag_id": self.get_current_tag_id,
+                                                             "started": datetime.now().isoformat()
+                                                         }}]])
             return SessionResponses.SessionStartSuccess
         return SessionResponses.SessionStartFailure
 
-    def __set_watchdogs(self, meter_sample_time: int, connector_timeout: int, max_charging_time=180):
-        connector_id = f"{self.evse_id}_{self.connector_id}"
-        # Add a watchdog for the max charging time
-        self._charging_scheduler.add_job(self._stop_transaction_function, 'interval',
-                                         minutes=self._max_charging_time,
-                                         id=f"charging_watchdog_{connector_id}",
+    def _is_sampling_enabled(self) -> bool:
+        return isinstance(self._power_meter, PowerMeter) and ConnectorV201._sampling_info.SampledDataEnabled
+
+    def _on_max_charging_time(self):
+        self._charging_scheduler.add_job(self._stop_transaction_function,
                                          args=[self.evse_id, self.connector_id, "", ReasonType.time_limit_reached],
                                          max_instances=1)
-        if isinstance(self._power_meter, PowerMeter) and ConnectorV201._sampling_info.SampledDataEnabled:
-            # Add a job for sampling the meter values
-            self._charging_scheduler.add_job(self._sample_meter,
-                                             'interval',
-                                             seconds=1,
-                                             id=f"meter_sampling_{connector_id}",
-                                             max_instances=1)
-            self._charging_scheduler.add_job(self._update_meter_values,
-                                             'interval',
-                                             seconds=meter_sample_time,
-                                             id=f"update_meter_values_{connector_id}",
-                                             max_instances=1)
-            # Check if connector is plugged periodically
-            self._charging_scheduler.add_job(self.__check_if_connector_plugged, 'interval',
-                                             seconds=connector_timeout,
-                                             id=f"connector_timeout_{connector_id}",
-                                             max_instances=1)
 
-    def __check_if_connector_plugged(self):
+    def _check_if_connector_plugged(self):
         # If the power is still not being drawn, stop charging
-        if self.get_power_draw < self._power_meter_min_power and self.is_charging():
+        if self.get_recent_avg_power < self._power_meter_min_power and self.is_charging():
             self._charging_scheduler.add_job(self._send_meter_values_function,
                                              args=[self.evse_id, self.connector_id,
                                                    TriggerReasonType.ev_connect_timeout])